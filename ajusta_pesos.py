@@ -0,0 +1,297 @@
+"""
+Ajuste de los pesos de las funciones de evaluación (estilo Texel)
+
+    1- Se juntan posiciones con el resultado final de su partida, de un
+       archivo o generadas por autojuego
+    2- Se extraen en lote las características de la evaluación como
+       matrices de NumPy (una fila por posición)
+    3- Se ajustan los pesos con regresión logística (método de Newton,
+       vectorizado) para que sigmoide(X @ w) prediga el resultado
+    4- Se escriben los pesos en pesos.json, que los módulos de cada
+       juego leen al importarse
+
+Características (siempre desde el punto de vista del jugador 1):
+
+    conecta4: ventanas de tres completas del jugador 1 menos las del
+        jugador -1, por dirección (los pesos de evalua_3con)
+    uttt: tableros ganados, dos en línea y uno en línea en los tableros
+        en curso, y tableros estratégicos ganados (los pesos de heuristic)
+
+Los pesos se reescalan para conservar el rango de las evaluaciones
+(el mayor peso de conecta4 vale 1, y en uttt el peso de un tablero
+ganado vale 100), y no se guardan si tienen signos inesperados o si la
+evaluación podría salir de (-1, 1).
+
+Archivo de posiciones: una línea JSON por posición, con "estado" (y
+"jugador") o "jugadas", y "resultado" (1, 0 o -1, para el jugador 1).
+
+    python ajusta_pesos.py conecta4 --partidas 200000
+    python ajusta_pesos.py uttt --posiciones partidas.jsonl
+
+Este módulo necesita NumPy.
+
+"""
+import sys
+import json
+import random
+import argparse
+from time import perf_counter
+
+import numpy as np
+
+from catalogo import juego, posicion
+from pesos import guarda_pesos
+from ultimate_tictactoe import ESCALA_UTTT
+from conecta4_vectorial import (
+    autojuego, politica_aleatoria, politica_heuristica, ventanas3_lote
+)
+
+LINEAS = np.array([
+    (0, 1, 2), (3, 4, 5), (6, 7, 8),
+    (0, 3, 6), (1, 4, 7), (2, 5, 8),
+    (0, 4, 8), (2, 4, 6)
+])
+ESTRATEGICOS = [0, 2, 4, 6, 8]
+
+
+def caracteristicas_conecta4(tableros):
+    """
+    Matriz (M, 4) de características para tableros (M, 42)
+
+    """
+    return ventanas3_lote(np.asarray(tableros, dtype=np.int8)).astype(float)
+
+
+def caracteristicas_uttt(boards, macro):
+    """
+    Matriz (M, 4) de características: tableros ganados, dos en línea,
+    uno en línea y tableros estratégicos ganados
+
+    Parametros
+    ----------
+    boards: arreglo (M, 9, 9) con las casillas de los tableros pequeños
+    macro: arreglo (M, 9) con el estado de cada tablero pequeño
+
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    macro = np.asarray(macro, dtype=np.int8)
+    lineas = boards[:, :, LINEAS]
+    n1 = (lineas == 1).sum(axis=3)
+    n2 = (lineas == -1).sum(axis=3)
+    n0 = 3 - n1 - n2
+    en_curso = macro == 0
+
+    def por_tablero(cuenta):
+        return (cuenta.sum(axis=2) * en_curso).sum(axis=1)
+
+    dos = por_tablero((n1 == 2) & (n0 == 1)) - por_tablero((n2 == 2) & (n0 == 1))
+    uno = por_tablero((n1 == 1) & (n0 == 2)) - por_tablero((n2 == 1) & (n0 == 2))
+    ganados = (macro == 1).sum(axis=1) - (macro == -1).sum(axis=1)
+    m = macro[:, ESTRATEGICOS]
+    estrategicos = (m == 1).sum(axis=1) - (m == -1).sum(axis=1)
+    return np.stack([ganados, dos, uno, estrategicos], axis=1).astype(float)
+
+
+def caracteristicas(nombre, estados):
+    """
+    Matriz de características para una lista de estados del modelo
+
+    """
+    if nombre == 'conecta4':
+        return caracteristicas_conecta4(estados)
+    if nombre == 'uttt':
+        return caracteristicas_uttt(
+            [s[0] for s in estados], [s[1] for s in estados]
+        )
+    raise ValueError(f"No hay características para {nombre!r}")
+
+
+def genera_conecta4(partidas, epsilon=0.25, rng=None):
+    """
+    Posiciones de autojuego (vectorizado) de conecta 4. Cada jugada es
+    de la política heurística, o aleatoria con probabilidad epsilon
+
+    Regresa
+    -------
+    (X, y): características (M, 4) y resultado para el jugador 1
+
+    """
+    rng = np.random.default_rng() if rng is None else rng
+
+    def politica(lote, rng):
+        azar = rng.random(lote.n) < epsilon
+        return np.where(
+            azar, politica_aleatoria(lote, rng), politica_heuristica(lote, rng)
+        )
+
+    _, (tableros, _, resultado) = autojuego(
+        politica, politica, n=min(4096, partidas), partidas=partidas,
+        rng=rng, registra=True
+    )
+    return caracteristicas_conecta4(tableros), resultado.astype(float)
+
+
+def genera_uttt(partidas, semilla=None):
+    """
+    Posiciones de partidas aleatorias de UTTT
+
+    Regresa
+    -------
+    (X, y): características (M, 4) y resultado para el jugador 1
+
+    """
+    azar = random.Random(semilla)
+    modelo = juego('uttt')['modelo']()
+    estados, resultados = [], []
+    for _ in range(partidas):
+        s, j = modelo.inicializa()
+        partida = []
+        g = modelo.resultado(s)
+        while g == None:
+            partida.append(s)
+            s = modelo.transicion(s, azar.choice(modelo.jugadas_legales(s, j)), j)
+            j = -j
+            g = modelo.resultado(s)
+        estados.extend(partida)
+        resultados.extend([g] * len(partida))
+    return caracteristicas('uttt', estados), np.array(resultados, dtype=float)
+
+
+def lee_posiciones(nombre, archivo):
+    """
+    Lee posiciones con su resultado de un archivo de líneas JSON
+
+    Regresa
+    -------
+    (X, y): características y resultado para el jugador 1
+
+    """
+    info = juego(nombre)
+    estados, resultados = [], []
+    with open(archivo) as f:
+        for linea in f:
+            if not linea.strip():
+                continue
+            datos = json.loads(linea)
+            if 'estado' in datos:
+                estados.append(info['lee_estado'](datos['estado']))
+            else:
+                estados.append(posicion(nombre, datos['jugadas'])[1])
+            resultados.append(datos['resultado'])
+    return caracteristicas(nombre, estados), np.array(resultados, dtype=float)
+
+
+def ajusta(X, y, l2=1e-6, iteraciones=50, tolerancia=1e-9):
+    """
+    Regresión logística con término independiente, por el método de
+    Newton. El resultado y en {-1, 0, 1} se convierte en probabilidad
+    de ganar del jugador 1 (el empate cuenta como 1/2)
+
+    Regresa
+    -------
+    (w, b, perdida): pesos, término independiente y entropía cruzada
+        media
+
+    """
+    m = len(X)
+    A = np.hstack([X, np.ones((m, 1))])
+    p_obj = (y + 1) / 2
+    w = np.zeros(A.shape[1])
+    identidad = np.eye(A.shape[1]) * l2
+    identidad[-1, -1] = 0
+    for _ in range(iteraciones):
+        p = 1 / (1 + np.exp(-(A @ w)))
+        gradiente = A.T @ (p - p_obj) / m + identidad @ w
+        hessiana = (A.T * (p * (1 - p))) @ A / m + identidad
+        paso = np.linalg.solve(hessiana, gradiente)
+        w -= paso
+        if np.abs(paso).max() < tolerancia:
+            break
+    p = np.clip(1 / (1 + np.exp(-(A @ w))), 1e-12, 1 - 1e-12)
+    perdida = -np.mean(p_obj * np.log(p) + (1 - p_obj) * np.log(1 - p))
+    return w[:-1], w[-1], perdida
+
+
+def a_pesos(nombre, w):
+    """
+    Convierte los coeficientes ajustados al formato de pesos.json,
+    reescalados al rango de las evaluaciones
+
+    """
+    if nombre == 'conecta4':
+        return {'ventanas3': (w / np.abs(w).max()).round(4).tolist()}
+    if w[0] <= 0:
+        raise ValueError(
+            f"el peso de un tablero ganado salió {w[0]:.4g} (debe ser positivo)"
+        )
+    macro, dos, uno, estrategica = (w * 100 / w[0]).round(3).tolist()
+    return {
+        'macro': macro, 'potencial': 1, 'estrategica': estrategica,
+        'dos': dos, 'uno': uno,
+    }
+
+
+def valida_pesos(nombre, pesos):
+    """
+    Verifica que los pesos tengan los signos esperados y que la mayor
+    evaluación posible quede dentro de (-1, 1), como suponen la
+    búsqueda (abs(v) >= 1 es un valor decidido), el reloj y los
+    márgenes de futilidad del catálogo. Lanza ValueError si no
+
+    """
+    if nombre == 'conecta4':
+        # Con pesos en [0, 1] el máximo es 1 solo si las 98 ventanas son
+        # del mismo jugador, lo que no ocurre en un tablero legal
+        w = pesos['ventanas3']
+        if len(w) != 4 or not all(0 <= x <= 1 for x in w) or max(w) == 0:
+            raise ValueError(f"pesos de ventanas fuera de [0, 1]: {w}")
+        return
+    negativos = [k for k, v in pesos.items() if v < 0]
+    if pesos['macro'] <= 0 or negativos:
+        raise ValueError(f"pesos con signo inesperado: {pesos}")
+    # Cota de heuristic: 9 tableros ganados, 5 estratégicos y 8 líneas
+    # por cada tablero en curso
+    cota = (
+        9 * pesos['macro'] + 5 * pesos['estrategica']
+        + 9 * 8 * pesos['potencial'] * max(pesos['dos'], pesos['uno'])
+    )
+    if cota >= ESCALA_UTTT:
+        raise ValueError(
+            f"la heurística puede llegar a {cota:g}, mayor que la escala "
+            f"de evalua_uttt ({ESCALA_UTTT})"
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('juego', choices=['conecta4', 'uttt'])
+    parser.add_argument('--posiciones',
+                        help="Archivo de posiciones (si no, autojuego)")
+    parser.add_argument('--partidas', type=int, default=20000,
+                        help="Partidas de autojuego")
+    parser.add_argument('--semilla', type=int)
+    parser.add_argument('--l2', type=float, default=1e-6)
+    parser.add_argument('--salida', help="Archivo de pesos (pesos.json)")
+    args = parser.parse_args()
+
+    t0 = perf_counter()
+    if args.posiciones:
+        X, y = lee_posiciones(args.juego, args.posiciones)
+    elif args.juego == 'conecta4':
+        X, y = genera_conecta4(
+            args.partidas, rng=np.random.default_rng(args.semilla)
+        )
+    else:
+        X, y = genera_uttt(args.partidas, args.semilla)
+    t1 = perf_counter()
+    w, b, perdida = ajusta(X, y, args.l2)
+    t2 = perf_counter()
+    print(f"{len(X)} posiciones ({t1 - t0:.1f}s), ajuste en {t2 - t1:.2f}s")
+    print(f"Entropía cruzada: {perdida:.4f}, término independiente {b:.4f}")
+    try:
+        pesos = a_pesos(args.juego, w)
+        print("Pesos:", pesos)
+        valida_pesos(args.juego, pesos)
+    except ValueError as e:
+        sys.exit(f"Pesos rechazados, no se guardan: {e}")
+    guarda_pesos(args.juego, pesos, args.salida)
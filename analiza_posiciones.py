@@ -0,0 +1,221 @@
+"""
+Análisis de posiciones en lote, sin menús interactivos
+
+Lee posiciones de un archivo o de la entrada estándar, una por línea, las
+analiza en un grupo de procesos con un presupuesto de tiempo, nodos o
+profundidad por posición, y escribe una línea JSON por posición en el
+mismo orden de la entrada. Las posiciones se leen conforme se necesitan
+y solo hay unas cuantas en vuelo, así que la memoria no depende del
+tamaño de la entrada.
+
+Cada línea de entrada puede ser:
+
+    - Las jugadas desde el estado inicial ('4453' o '4,4 4,0' en UTTT)
+    - Un objeto JSON {"estado": [...], "jugador": 1} o {"jugadas": "..."}
+      con un "id" opcional que se copia a la salida
+
+Salida por línea:
+
+    {"linea": 3, "jugada": 4, "valor": 0.01, "d": 8, "nodos": 51234,
+     "pv": [4, 3, 4], "tiempo": 0.98}
+
+    o bien {"linea": 3, "error": "..."}
+
+Con --archivo-tabla todos los procesos comparten una tabla de
+transposición en un archivo que se conserva entre ejecuciones, de modo
+que volver a analizar las mismas aperturas empieza con los resultados
+de la vez anterior.
+
+Ejemplos:
+
+    python analiza_posiciones.py conecta4 posiciones.txt --tiempo 1
+    cat posiciones.txt | python analiza_posiciones.py uttt --nodos 50000
+    python analiza_posiciones.py conecta4 aperturas.txt --d 12 \
+        --archivo-tabla conecta4.tt
+
+"""
+import os
+import sys
+import json
+import argparse
+from time import time
+from collections import deque
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+
+from catalogo import JUEGOS, juego, posicion, tabla_persistente
+from minimax import busqueda_iterativa
+from transposicion import TablaTransposicion
+
+# Tabla de transposición de cada proceso del grupo
+_transp = None
+
+
+def _inicia_proceso(mb, nombre=None, archivo=None):
+    global _transp
+    if archivo != None:
+        _transp = tabla_persistente(nombre, archivo, mb)
+    else:
+        _transp = TablaTransposicion(mb)
+
+
+def _misma_forma(estado, modelo):
+    """
+    True si el estado tiene las mismas tuplas anidadas (y del mismo
+    largo) que el estado de referencia
+
+    """
+    if not isinstance(modelo, tuple):
+        return True
+    return (
+        isinstance(estado, tuple) and len(estado) == len(modelo)
+        and all(_misma_forma(e, m) for e, m in zip(estado, modelo))
+    )
+
+
+def lee_posicion(nombre, linea):
+    """
+    Convierte una línea de entrada en (id, estado, jugador)
+
+    """
+    linea = linea.strip()
+    if linea.startswith('{'):
+        datos = json.loads(linea)
+        if 'estado' in datos:
+            info = juego(nombre)
+            estado = info['lee_estado'](datos['estado'])
+            inicial, _ = info['modelo']().inicializa()
+            if not _misma_forma(estado, inicial):
+                raise ValueError("el estado no tiene la forma del juego")
+            if datos.get('jugador') not in (1, -1):
+                raise ValueError("jugador debe ser 1 o -1")
+            return datos.get('id'), estado, datos['jugador']
+        _, estado, jugador = posicion(nombre, datos.get('jugadas', ''))
+        return datos.get('id'), estado, datos.get('jugador', jugador)
+    _, estado, jugador = posicion(nombre, linea)
+    return None, estado, jugador
+
+
+def analiza_linea(nombre, linea, tiempo, nodos, d_max, conserva_tabla):
+    """
+    Analiza una posición (corre en un proceso del grupo)
+
+    Regresa
+    -------
+    dict: resultado serializable en JSON
+
+    """
+    try:
+        id_, estado, jugador = lee_posicion(nombre, linea)
+        info = JUEGOS[nombre]
+        modelo = info['modelo']()
+        g = modelo.resultado(estado)
+        if g != None:
+            return {'id': id_, 'terminal': True, 'ganancia': g}
+        if not conserva_tabla:
+            _transp.limpia()
+        t0 = time()
+        traza, v, d, n = busqueda_iterativa(
+            modelo, estado, jugador, tiempo=tiempo, nodos=nodos,
+            d_max=d_max, ordena=info['ordena'], evalua=info['evalua'],
+            transp=_transp
+        )
+        return {
+            'id': id_, 'jugada': traza[0], 'valor': v, 'd': d,
+            'nodos': n, 'pv': traza, 'tiempo': time() - t0,
+        }
+    except (KeyError, TypeError, ValueError) as e:
+        return {'error': f"posición inválida: {e}"}
+    except Exception as e:
+        # Un error en una posición no debe detener el resto del lote
+        return {'error': f"error interno: {e!r}"}
+
+
+def analiza_flujo(
+    nombre, lineas, tiempo=None, nodos=None, d_max=None,
+    procesos=None, en_vuelo=None, mb=16, conserva_tabla=False,
+    archivo_tabla=None
+    ):
+    """
+    Generador de resultados, en el orden de las líneas de entrada
+
+    Parametros
+    ----------
+    nombre (str): Juego del catálogo
+    lineas (iterable): Posiciones (se consumen conforme se necesitan)
+    tiempo, nodos, d_max: Presupuesto por posición
+    procesos (int): Procesos del grupo (None, uno por CPU)
+    en_vuelo (int): Posiciones enviadas sin resultado escrito
+        (None, cuatro por proceso)
+    mb (float): Memoria de la tabla de transposición de cada proceso
+    conserva_tabla (bool): Si True no se limpia la tabla entre
+        posiciones (más rápido, pero el resultado depende del orden)
+    archivo_tabla (str): Archivo de una tabla persistente compartida
+        por todos los procesos (implica conserva_tabla; si el archivo
+        ya existe, mb no cambia su tamaño)
+
+    Regresa (genera)
+    ----------------
+    dict por cada línea no vacía, con el número de línea
+
+    """
+    juego(nombre)
+    if tiempo == None and nodos == None and d_max == None:
+        raise ValueError("Se necesita un presupuesto: tiempo, nodos o d")
+    conserva_tabla = conserva_tabla or archivo_tabla != None
+    if archivo_tabla != None:
+        # Se crea (o reinicia) el archivo antes de que lo abran los procesos
+        tabla_persistente(nombre, archivo_tabla, mb).cierra()
+    with ProcessPoolExecutor(
+        procesos, initializer=_inicia_proceso,
+        initargs=(mb, nombre, archivo_tabla)
+    ) as grupo:
+        en_vuelo = en_vuelo or 4 * (procesos or os.cpu_count() or 1)
+        pendientes = deque()
+        numeradas = (
+            (i, l) for i, l in enumerate(lineas, 1) if l.strip()
+        )
+        for i, linea in chain(numeradas, [(None, None)]):
+            if i != None:
+                pendientes.append((i, grupo.submit(
+                    analiza_linea, nombre, linea, tiempo, nodos, d_max,
+                    conserva_tabla
+                )))
+            while pendientes and (i == None or len(pendientes) >= en_vuelo):
+                n, futuro = pendientes.popleft()
+                resultado = futuro.result()
+                if resultado.get('id') == None:
+                    resultado.pop('id', None)
+                yield {'linea': n, **resultado}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('juego', choices=list(JUEGOS))
+    parser.add_argument('entrada', nargs='?', default='-',
+                        help="Archivo de posiciones ('-' entrada estándar)")
+    parser.add_argument('--tiempo', type=float,
+                        help="Segundos por posición")
+    parser.add_argument('--nodos', type=int, help="Nodos por posición")
+    parser.add_argument('--d', type=int, help="Profundidad máxima")
+    parser.add_argument('--procesos', type=int)
+    parser.add_argument('--en-vuelo', type=int)
+    parser.add_argument('--mb', type=float, default=16,
+                        help="Memoria de la tabla de cada proceso")
+    parser.add_argument('--conserva-tabla', action='store_true')
+    parser.add_argument('--archivo-tabla',
+                        help="Tabla persistente en archivo, entre ejecuciones")
+    args = parser.parse_args()
+    if args.tiempo == None and args.nodos == None and args.d == None:
+        parser.error("se necesita --tiempo, --nodos o --d")
+
+    entrada = sys.stdin if args.entrada == '-' else open(args.entrada)
+    try:
+        for resultado in analiza_flujo(
+            args.juego, entrada, args.tiempo, args.nodos, args.d,
+            args.procesos, args.en_vuelo, args.mb, args.conserva_tabla,
+            args.archivo_tabla
+        ):
+            print(json.dumps(resultado), flush=True)
+    finally:
+        entrada.close()
@@ -0,0 +1,368 @@
+"""
+Benchmarks de los modelos de juego y de los motores de búsqueda
+
+    1- Perft: número de nodos a profundidad d desde posiciones fijas.
+       Como los valores esperados son conocidos, sirve también como
+       prueba de correctez de jugadas_legales, transicion y terminal.
+    2- Búsqueda: nodos, tiempo y nodos por segundo de negamax,
+       negamax selectivo (reducciones y futilidad), alpha_beta,
+       ai_player y la búsqueda por números de prueba en posiciones
+       fijas, y el tiempo que le toma a negamax (profundización
+       iterativa, exacto y selectivo) llegar a cada profundidad.
+
+Los resultados se escriben en JSON y se pueden comparar contra una
+línea base guardada:
+
+    python benchmark.py --salida actual.json
+    python benchmark.py --base base.json --tolerancia 0.2
+
+El programa termina con código 1 si algún perft no coincide, si algún
+benchmark genera un número de nodos distinto al de la base o si es más
+lento que la base por más de la tolerancia. Cada caso se corre varias
+veces y se compara la corrida más rápida.
+
+"""
+import io
+import sys
+import json
+import random
+import argparse
+import platform
+from time import perf_counter
+from contextlib import redirect_stdout
+
+from catalogo import JUEGOS, posicion
+from minimax import negamax
+from juegos_simplificado import alpha_beta
+from ultimate_tictactoe import ai_player
+from numeros_prueba import resuelve
+
+
+# Nodos esperados a profundidad 1, 2, ... desde cada posición
+PERFT = {
+    ('gato', ''): [9, 72, 504, 3024, 15120, 54720, 148176, 200448, 127872],
+    ('conecta4', ''): [7, 49, 343, 2401, 16807, 117649],
+    ('uttt', ''): [81, 720, 6336, 55080],
+}
+
+# (juego, jugadas iniciales, motor, profundidad)
+BUSQUEDAS = [
+    ('gato', '', 'negamax', None),
+    ('gato', '', 'alpha_beta', None),
+    ('gato', '40', 'negamax', None),
+    ('conecta4', '', 'negamax', 6),
+    ('conecta4', '', 'selectivo', 6),
+    ('conecta4', '33332244', 'negamax', 6),
+    ('conecta4', '3324', 'negamax', 7),
+    ('conecta4', '3324', 'selectivo', 7),
+    ('conecta4', '364663346411643546103210', 'alpha_beta', None),
+    ('uttt', '', 'negamax', 3),
+    ('uttt', '4,4 4,0 0,4 4,8 8,4', 'negamax', 3),
+    ('uttt', '4,4 4,0 0,4 4,8 8,4', 'negamax', 5),
+    ('uttt', '4,4 4,0 0,4 4,8 8,4', 'selectivo', 5),
+    ('uttt', '4,4 4,0 0,4 4,8 8,4', 'ai_player', 3),
+    ('gato', '', 'prueba', None),
+    ('conecta4', '06044313332064045306', 'prueba', None),
+    ('uttt', '7,8 8,0 0,4 4,3 3,2 2,1 1,1 1,7 7,4 4,7 7,6 6,6 6,1 1,2 2,4 '
+             '4,8 8,8 8,5 5,5 5,6 6,5 5,2 2,6 6,0 0,5 5,3 3,3 3,7 7,3 3,8 '
+             '8,4 4,6 6,8 8,1 1,8', 'prueba', None),
+]
+
+# (juego, jugadas iniciales, profundidad máxima, selectivo)
+PROFUNDIZACION = [
+    ('conecta4', '', 7, False),
+    ('conecta4', '', 7, True),
+    ('uttt', '', 4, False),
+    ('uttt', '', 4, True),
+]
+
+
+# Cada caso se corre varias veces y se usa el tiempo más rápido; los
+# tiempos menores a MINIMO segundos no se comparan contra la base
+REPETICIONES = 3
+MINIMO = 0.005
+
+
+class JuegoContado:
+    """
+    Envuelve un modelo de juego y cuenta los nodos generados
+    (llamadas a transicion) sin modificar los motores de búsqueda
+
+    """
+    def __init__(self, juego):
+        self.juego = juego
+        self.nodos = 0
+
+    def __getattr__(self, nombre):
+        return getattr(self.juego, nombre)
+
+    def transicion(self, s, a, j):
+        self.nodos += 1
+        return self.juego.transicion(s, a, j)
+
+
+def perft(juego, estado, jugador, d):
+    """
+    Número de secuencias de exactamente d jugadas desde el estado.
+    Los estados terminales anteriores a d no se expanden.
+
+    """
+    if d == 0:
+        return 1
+    if juego.resultado(estado) is not None:
+        return 0
+    return sum(
+        perft(juego, juego.transicion(estado, a, jugador), -jugador, d - 1)
+        for a in juego.jugadas_legales(estado, jugador)
+    )
+
+
+def bench_perft(nombre, jugadas, d_max, repeticiones=REPETICIONES):
+    """
+    Corre perft de 1 a d_max y compara con los valores esperados
+    (el tiempo es el mínimo de las repeticiones)
+
+    """
+    modelo, s, j = posicion(nombre, jugadas)
+    esperados = PERFT.get((nombre, jugadas), [])
+    resultados = []
+    for d in range(1, d_max + 1):
+        t = None
+        for _ in range(repeticiones):
+            t0 = perf_counter()
+            n = perft(modelo, s, j, d)
+            t = min(perf_counter() - t0, t or float('inf'))
+        esperado = esperados[d - 1] if d <= len(esperados) else None
+        resultados.append({
+            'd': d, 'nodos': n, 'esperado': esperado,
+            'correcto': esperado is None or n == esperado,
+            'tiempo': t, 'nps': n / t if t > 0 else None,
+        })
+    return resultados
+
+
+def busca(nombre, jugadas, motor, d, repeticiones=REPETICIONES):
+    """
+    Corre un motor de búsqueda en una posición fija
+
+    Regresa
+    -------
+    dict: jugada, nodos, tiempo y nodos por segundo (de la repetición
+    más rápida; los nodos no cambian entre repeticiones)
+
+    """
+    corridas = [
+        _busca_una(nombre, jugadas, motor, d) for _ in range(repeticiones)
+    ]
+    return min(corridas, key=lambda r: r['tiempo'])
+
+
+def _busca_una(nombre, jugadas, motor, d):
+    modelo, s, j = posicion(nombre, jugadas)
+    juego = JuegoContado(modelo)
+    info = JUEGOS[nombre]
+    random.seed(0)
+    t0 = perf_counter()
+    if motor in ('negamax', 'selectivo'):
+        selectivo = motor == 'selectivo'
+        traza, v = negamax(
+            juego, s, j, ordena=info['ordena'], d=d,
+            evalua=info['evalua'] if d is not None else None,
+            transp={}, traza=[], reducciones=selectivo,
+            futilidad=info['futilidad'] if selectivo else None
+        )
+        jugada = traza[0]
+    elif motor == 'alpha_beta':
+        v, jugada = None, alpha_beta(juego, s, j)
+    elif motor == 'ai_player':
+        with redirect_stdout(io.StringIO()):
+            v, jugada = None, ai_player(juego, s, j)
+    elif motor == 'prueba':
+        v, jugada, _ = resuelve(juego, s, j, ordena=info['ordena'])
+    else:
+        raise ValueError(f"Motor desconocido {motor!r}")
+    t = perf_counter() - t0
+    return {
+        'jugada': jugada, 'valor': v, 'nodos': juego.nodos,
+        'tiempo': t, 'nps': juego.nodos / t if t > 0 else None,
+    }
+
+
+def profundizacion(
+    nombre, jugadas, d_max, selectivo=False, repeticiones=REPETICIONES
+    ):
+    """
+    Tiempo acumulado y nodos de negamax con profundización iterativa
+    (compartiendo la tabla de transposición) para cada profundidad. El
+    tiempo de cada profundidad es el mínimo de las repeticiones
+
+    """
+    corridas = [
+        _profundiza_una(nombre, jugadas, d_max, selectivo)
+        for _ in range(repeticiones)
+    ]
+    resultados = corridas[0]
+    for i, fila in enumerate(resultados):
+        fila['tiempo'] = min(c[i]['tiempo'] for c in corridas)
+    return resultados
+
+
+def _profundiza_una(nombre, jugadas, d_max, selectivo):
+    modelo, s, j = posicion(nombre, jugadas)
+    juego = JuegoContado(modelo)
+    info = JUEGOS[nombre]
+    random.seed(0)
+    transp, traza, resultados = {}, [], []
+    t0 = perf_counter()
+    for d in range(1, d_max + 1):
+        traza, v = negamax(
+            juego, s, j, ordena=info['ordena'], d=d,
+            evalua=info['evalua'], transp=transp, traza=traza,
+            reducciones=selectivo,
+            futilidad=info['futilidad'] if selectivo else None
+        )
+        t = perf_counter() - t0
+        resultados.append({
+            'd': d, 'jugada': traza[0], 'valor': v,
+            'nodos': juego.nodos, 'tiempo': t,
+        })
+    return resultados
+
+
+def corre(rapido=False, repeticiones=REPETICIONES):
+    """
+    Corre todos los benchmarks y regresa un diccionario serializable
+
+    """
+    res = {
+        'python': platform.python_version(),
+        'maquina': platform.machine(),
+        'perft': {}, 'busqueda': {}, 'profundizacion': {},
+    }
+    for (nombre, jugadas), esperados in PERFT.items():
+        d_max = len(esperados) - (2 if rapido else 0)
+        res['perft'][_llave(nombre, jugadas)] = bench_perft(
+            nombre, jugadas, d_max, repeticiones
+        )
+    for nombre, jugadas, motor, d in BUSQUEDAS:
+        if rapido and d is not None:
+            d -= 1
+        llave = _llave(nombre, jugadas, motor, d)
+        res['busqueda'][llave] = busca(
+            nombre, jugadas, motor, d, repeticiones
+        )
+    for nombre, jugadas, d_max, selectivo in PROFUNDIZACION:
+        if rapido:
+            d_max -= 2
+        llave = _llave(nombre, jugadas, *(['selectivo'] if selectivo else []))
+        res['profundizacion'][llave] = profundizacion(
+            nombre, jugadas, d_max, selectivo, repeticiones
+        )
+    return res
+
+
+def compara(actual, base, tolerancia=0.1, minimo=MINIMO):
+    """
+    Compara resultados contra una línea base. Los nodos deben coincidir
+    exactamente (las búsquedas usan una semilla fija) y los tiempos por
+    debajo de `minimo` segundos se cuentan como `minimo`, porque a esa
+    escala el ruido supera a la tolerancia
+
+    Regresa
+    -------
+    list: mensajes con los problemas encontrados (vacía si todo bien)
+
+    """
+    problemas = []
+    for llave, filas in actual['perft'].items():
+        for fila in filas:
+            if not fila['correcto']:
+                problemas.append(
+                    f"perft {llave} d={fila['d']}: {fila['nodos']} nodos,"
+                    f" se esperaban {fila['esperado']}"
+                )
+    pares = [
+        ('perft', llave, f"d={a['d']}", a, b)
+        for llave, filas in actual['perft'].items()
+        for a, b in zip(filas, base.get('perft', {}).get(llave, []))
+    ] + [
+        ('busqueda', llave, '', a, base['busqueda'][llave])
+        for llave, a in actual['busqueda'].items()
+        if llave in base.get('busqueda', {})
+    ] + [
+        ('profundizacion', llave, f"d={a['d']}", a, b)
+        for llave, filas in actual['profundizacion'].items()
+        for a, b in zip(filas, base.get('profundizacion', {}).get(llave, []))
+    ]
+    for tipo, llave, extra, a, b in pares:
+        if a['nodos'] != b['nodos']:
+            problemas.append(
+                f"{tipo} {llave} {extra}: {a['nodos']} nodos contra"
+                f" {b['nodos']} de la base"
+            )
+        t_a, t_b = max(a['tiempo'], minimo), max(b['tiempo'], minimo)
+        if t_a > t_b * (1 + tolerancia):
+            problemas.append(
+                f"{tipo} {llave} {extra}: {a['tiempo']:.4f}s contra"
+                f" {b['tiempo']:.4f}s de la base"
+                f" ({t_a / t_b - 1:+.0%})"
+            )
+    return problemas
+
+
+def _llave(*partes):
+    return '|'.join(str(p) for p in partes)
+
+
+def imprime(res):
+    print(f"Python {res['python']} ({res['maquina']})")
+    print("\nPerft")
+    for llave, filas in res['perft'].items():
+        for f in filas:
+            marca = '' if f['correcto'] else '  <-- ERROR'
+            print(
+                f"  {llave:<20} d={f['d']:<2} {f['nodos']:>10} nodos"
+                f" {f['tiempo']:8.3f}s {f['nps'] or 0:>10.0f} n/s{marca}"
+            )
+    print("\nBúsqueda")
+    for llave, f in res['busqueda'].items():
+        print(
+            f"  {llave:<45} {f['nodos']:>9} nodos {f['tiempo']:8.3f}s"
+            f" {f['nps'] or 0:>10.0f} n/s  jugada {f['jugada']}"
+        )
+    print("\nTiempo a profundidad (negamax iterativo)")
+    for llave, filas in res['profundizacion'].items():
+        for f in filas:
+            print(
+                f"  {llave:<20} d={f['d']:<2} {f['nodos']:>9} nodos"
+                f" {f['tiempo']:8.3f}s  jugada {f['jugada']}"
+            )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--salida', help="Archivo JSON para los resultados")
+    parser.add_argument('--base', help="Archivo JSON con la línea base")
+    parser.add_argument('--tolerancia', type=float, default=0.1,
+                        help="Regresión de tiempo permitida (0.1 = 10%%)")
+    parser.add_argument('--rapido', action='store_true',
+                        help="Profundidades menores, para pruebas rápidas")
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES,
+                        help="Corridas de cada caso (se usa la más rápida)")
+    parser.add_argument('--minimo', type=float, default=MINIMO,
+                        help="Tiempo mínimo que se compara, en segundos")
+    args = parser.parse_args()
+
+    res = corre(args.rapido, args.repeticiones)
+    imprime(res)
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump(res, f, indent=1)
+    base = {'perft': {}, 'busqueda': {}, 'profundizacion': {}}
+    if args.base:
+        with open(args.base) as f:
+            base = json.load(f)
+    problemas = compara(res, base, args.tolerancia, args.minimo)
+    for p in problemas:
+        print("PROBLEMA:", p)
+    sys.exit(1 if problemas else 0)
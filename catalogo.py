@@ -0,0 +1,138 @@
+"""
+Catálogo de los juegos del repositorio
+
+Reúne para cada juego el modelo, las funciones de ordenamiento y de
+evaluación que usa negamax (con los márgenes de futilidad en unidades de
+la evaluación y los pesos ajustados de la evaluación), la estimación de
+jugadas restantes que usa el reloj, y la forma de leer jugadas escritas
+como texto y estados que llegan como listas (por ejemplo desde JSON),
+para que las herramientas (benchmarks, servicios, análisis) no tengan
+que conocer los detalles de cada juego.
+
+"""
+import json
+
+from transposicion import TablaTransposicion
+from gato import Gato, jugadas_restantes_gato
+from conect4 import Conecta4, ordena_centro, evalua_3con_inc
+from conect4 import jugadas_restantes_conecta4, PESOS_C4
+from ultimate_tictactoe import UltimateTicTacToe, ordena_uttt, evalua_uttt
+from ultimate_tictactoe import jugadas_restantes_uttt, PESOS_UTTT
+
+
+def _lee_celda(texto):
+    return int(texto)
+
+
+def _lee_uttt(texto):
+    b, i = map(int, texto.split(','))
+    return (b, i)
+
+
+def _estado_tablero(datos):
+    return tuple(datos)
+
+
+def _estado_uttt(datos):
+    boards, macro, next_board = datos
+    return (tuple(map(tuple, boards)), tuple(macro), next_board)
+
+
+JUEGOS = {
+    'gato': {
+        'modelo': Gato,
+        'ordena': None,
+        'evalua': None,
+        'futilidad': None,
+        'lee_jugada': _lee_celda,
+        'lee_estado': _estado_tablero,
+        'jugadas_restantes': jugadas_restantes_gato,
+        'pesos': None,
+    },
+    'conecta4': {
+        'modelo': Conecta4,
+        'ordena': ordena_centro,
+        'evalua': evalua_3con_inc,
+        'futilidad': (0.03, 0.06),
+        'lee_jugada': _lee_celda,
+        'lee_estado': _estado_tablero,
+        'jugadas_restantes': jugadas_restantes_conecta4,
+        'pesos': PESOS_C4,
+    },
+    'uttt': {
+        'modelo': UltimateTicTacToe,
+        'ordena': ordena_uttt,
+        'evalua': evalua_uttt,
+        'futilidad': (0.005, 0.012),
+        'lee_jugada': _lee_uttt,
+        'lee_estado': _estado_uttt,
+        'jugadas_restantes': jugadas_restantes_uttt,
+        'pesos': PESOS_UTTT,
+    },
+}
+
+
+def juego(nombre):
+    """
+    Devuelve la entrada del catálogo para el juego con ese nombre
+
+    """
+    if nombre not in JUEGOS:
+        raise ValueError(
+            f"Juego desconocido {nombre!r}, se esperaba uno de {list(JUEGOS)}"
+        )
+    return JUEGOS[nombre]
+
+
+def lee_jugadas(nombre, texto):
+    """
+    Convierte un texto en una lista de jugadas
+
+    Las jugadas se separan con espacios. En gato y conecta 4 también
+    se pueden escribir pegadas, un dígito por jugada ('4453').
+    Para UTTT cada jugada es 'tablero,celda'.
+
+    """
+    fichas = texto.split()
+    if nombre != 'uttt' and len(fichas) == 1:
+        fichas = list(fichas[0])
+    return [juego(nombre)['lee_jugada'](f) for f in fichas]
+
+
+def posicion(nombre, jugadas=()):
+    """
+    Devuelve (modelo, estado, jugador) tras aplicar las jugadas desde
+    el estado inicial, verificando que cada una sea legal
+
+    Parametros
+    ----------
+    nombre (str): Nombre del juego en el catálogo
+    jugadas (str o lista): Jugadas desde el estado inicial
+
+    """
+    if isinstance(jugadas, str):
+        jugadas = lee_jugadas(nombre, jugadas)
+    modelo = juego(nombre)['modelo']()
+    s, j = modelo.inicializa()
+    for a in jugadas:
+        if modelo.terminal(s) or a not in list(modelo.jugadas_legales(s, j)):
+            raise ValueError(f"Jugada ilegal {a!r}")
+        s = modelo.transicion(s, a, j)
+        j = -j
+    return modelo, s, j
+
+
+def tabla_persistente(nombre, archivo, mb=64):
+    """
+    Tabla de transposición en un archivo para el juego, con una firma
+    que incluye la evaluación y sus pesos: si cambian, los resultados
+    guardados ya no valen y el archivo se reinicia
+
+    """
+    info = juego(nombre)
+    evalua = info['evalua']
+    firma = '|'.join([
+        nombre, getattr(evalua, '__name__', ''),
+        json.dumps(info['pesos'], sort_keys=True)
+    ])
+    return TablaTransposicion(mb, archivo=archivo, firma=firma)
@@ -24,27 +24,92 @@ fichas.
 La ganancia es 1 si gana el jugador 1, -1 si gana el jugador 2 y 0 si es un
 empate.
 
+Los estados que genera el modelo son de la clase TableroC4, una tupla que
+además lleva la cuenta de las ventanas de tres fichas en línea de cada
+jugador. La cuenta se actualiza en cada transición revisando solo las
+ventanas que pasan por la casilla donde cae la ficha, y con ella
+evalua_3con_inc da el mismo valor que evalua_3con sin recorrer el tablero.
+
 """
 
 from juegos_simplificado import ModeloJuegoZT2
 from juegos_simplificado import juega_dos_jugadores
 from minimax import jugador_negamax
 from minimax import minimax_iterativo
+from reloj import Reloj
+from pesos import carga_pesos
+
+# Ventanas de tres casillas que revisa evalua_3con, con su dirección
+# (0 vertical, 1 horizontal, 2 diagonal, 3 antidiagonal)
+VENTANAS_3 = (
+    [(0, (i + 7 * j, i + 7 * (j + 1), i + 7 * (j + 2)))
+     for i in range(7) for j in range(4)]
+    + [(1, (7 * i + j, 7 * i + j + 1, 7 * i + j + 2))
+       for i in range(6) for j in range(5)]
+    + [(2, (i + 7 * j, i + 7 * j + 8, i + 7 * j + 16))
+       for i in range(5) for j in range(4)]
+    + [(3, (i + 7 * j + 3, i + 7 * j + 9, i + 7 * j + 15))
+       for i in range(5) for j in range(4)]
+)
+
+# Para cada casilla: (dirección, otra casilla, otra casilla) de las
+# ventanas que pasan por ella
+_VENTANAS_3_CASILLA = [
+    [(d,) + tuple(x for x in v if x != c) for d, v in VENTANAS_3 if c in v]
+    for c in range(42)
+]
+
+def cuenta_ventanas3(s):
+    """
+    Cuenta desde cero las ventanas de tres completas de cada jugador
+
+    Regresa
+    -------
+    tuple: 8 enteros, las ventanas del jugador 1 por dirección y luego
+        las del jugador -1 por dirección
+    """
+    cuenta = [0] * 8
+    for d, (a, b, c) in VENTANAS_3:
+        if s[a] == s[b] == s[c] != 0:
+            cuenta[d if s[a] == 1 else d + 4] += 1
+    return tuple(cuenta)
+
+class TableroC4(tuple):
+    """
+    Estado de conecta 4: la tupla de 42 casillas con la cuenta de
+    ventanas de tres de cada jugador (ventanas3, ver cuenta_ventanas3).
+    Se compara y se usa como llave igual que la tupla de casillas.
+    """
+    def __new__(cls, casillas, ventanas3=None):
+        t = super().__new__(cls, casillas)
+        t.ventanas3 = cuenta_ventanas3(t) if ventanas3 is None else ventanas3
+        return t
 
 class Conecta4(ModeloJuegoZT2):
     def inicializa(self):
-        return (tuple([0 for _ in range(6 * 7)]), 1)
+        return (TableroC4([0 for _ in range(6 * 7)], (0,) * 8), 1)
         
     def jugadas_legales(self, s, j):
         return (columna for columna in range(7) if s[columna] == 0)
     
     def transicion(self, s, a, j):
+        ventanas3 = getattr(s, 'ventanas3', None)
         s = list(s[:])
         for i in range(5, -1, -1):
             if s[a + 7 * i] == 0:
                 s[a + 7 * i] = j
                 break
-        return tuple(s)
+        else:
+            return TableroC4(s, ventanas3)
+        if ventanas3 == None:
+            return TableroC4(s)
+        # Solo cambian las ventanas que pasan por la casilla nueva
+        cuenta = list(ventanas3)
+        base = 0 if j == 1 else 4
+        for d, b, c in _VENTANAS_3_CASILLA[a + 7 * i]:
+            if s[b] == j and s[c] == j:
+                cuenta[base + d] += 1
+        return TableroC4(s, tuple(cuenta))
     
     def ganancia(self, s):
         #Verticales
@@ -78,6 +143,12 @@ class Conecta4(ModeloJuegoZT2):
         if 0 not in s:
             return True
         return self.ganancia(s) != 0
+
+    def resultado(self, s):
+        g = self.ganancia(s)
+        if g != 0 or 0 not in s:
+            return g
+        return None
     
 def pprint_conecta4(s):
     a = [' X ' if x == 1 else ' O ' if x == -1 else '   ' 
@@ -104,11 +175,16 @@ def ordena_centro(jugadas, jugador):
     """
     return sorted(jugadas, key=lambda x: abs(x - 4))
 
+# Peso de las ventanas de tres de cada dirección (vertical, horizontal,
+# diagonal, antidiagonal) en evalua_3con (ver pesos.py y ajusta_pesos.py)
+PESOS_C4 = carga_pesos('conecta4', {'ventanas3': [1, 1, 1, 1]})
+
 def evalua_3con(s):
     """
     Evalua el estado s para el jugador 1
     """
-    conect3 = sum(
+    w = PESOS_C4['ventanas3']
+    conect3 = w[0] * (sum(
         1 for i in range(7) for j in range(4) 
         if (s[i + 7 * j] == s[i + 7 * (j + 1)] 
             == s[i + 7 * (j + 2)] == 1)
@@ -116,7 +192,7 @@ def evalua_3con(s):
         1 for i in range(7) for j in range(4) 
         if (s[i + 7 * j] == s[i + 7 * (j + 1)] 
             == s[i + 7 * (j + 2)] == -1)
-    ) + sum(
+    )) + w[1] * (sum(
         1 for i in range(6) for j in range(5) 
         if (s[7 * i + j] == s[7 * i + j + 1] 
             == s[7 * i + j + 2] == 1)
@@ -124,7 +200,7 @@ def evalua_3con(s):
         1 for i in range(6) for j in range(5) 
         if (s[7 * i + j] == s[7 * i + j + 1] 
             == s[7 * i + j + 2] == -1)
-    ) + sum(
+    )) + w[2] * (sum(
         1 for i in range(5) for j in range(4) 
         if (s[i + 7 * j] == s[i + 7 * j + 8] 
             == s[i + 7 * j + 16] == 1)
@@ -132,7 +208,7 @@ def evalua_3con(s):
         1 for i in range(5) for j in range(4) 
         if (s[i + 7 * j] == s[i + 7 * j + 8] 
             == s[i + 7 * j + 16] == -1)
-    ) + sum(
+    )) + w[3] * (sum(
         1 for i in range(5) for j in range(4) 
         if (s[i + 7 * j + 3] == s[i + 7 * j + 9] 
             == s[i + 7 * j + 15] == 1)
@@ -140,12 +216,32 @@ def evalua_3con(s):
         1 for i in range(5) for j in range(4) 
         if (s[i + 7 * j + 3] == s[i + 7 * j + 9] 
             == s[i + 7 * j + 15] == -1)
-    )
+    ))
     promedio = conect3 / (7 * 4 + 6 * 5 + 5 * 4 + 5 * 4)
     if abs(promedio) >= 1:
         print("ERROR, evaluación fuera de rango --> ", promedio)
     return promedio
 
+def evalua_3con_inc(s):
+    """
+    Igual que evalua_3con, pero leyendo la cuenta de ventanas que lleva
+    el estado (TableroC4) en lugar de recorrer el tablero
+    """
+    v = getattr(s, 'ventanas3', None)
+    if v == None:
+        return evalua_3con(s)
+    w = PESOS_C4['ventanas3']
+    return (
+        w[0] * (v[0] - v[4]) + w[1] * (v[1] - v[5])
+        + w[2] * (v[2] - v[6]) + w[3] * (v[3] - v[7])
+    ) / len(VENTANAS_3)
+
+
+def jugadas_restantes_conecta4(s):
+    """
+    Estima las jugadas que le faltan a un jugador (para el reloj)
+    """
+    return (s.count(0) + 1) // 2
 
     
 if __name__ == '__main__':
@@ -160,7 +256,8 @@ if __name__ == '__main__':
         print("   1. Jugador manual")
         print("   2. Jugador negamax limitado en profundidad")
         print("   3. Jugador negamax limitado en tiempo")
-        while sel not in [1, 2, 3]:
+        print("   4. Jugador negamax con reloj para toda la partida")
+        while sel not in [1, 2, 3, 4]:
             sel = int(input(f"Jugador para las {' XO'[j]}: "))
     
         if sel == 1:
@@ -170,14 +267,24 @@ if __name__ == '__main__':
             while type(d) != int or d < 1:
                 d = int(input("Profundidad: "))
             jugs.append(lambda juego, s, j: jugador_negamax(
-                juego, s, j, ordena=ordena_centro, evalua=evalua_3con, d=d)
+                juego, s, j, ordena=ordena_centro, evalua=evalua_3con_inc, d=d)
             )
-        else:
+        elif sel == 3:
             t = None
             while type(t) != int or t < 1:
                 t = int(input("Tiempo: "))
             jugs.append(lambda juego, s, j: minimax_iterativo(
-                juego, s, j, ordena=ordena_centro, evalua=evalua_3con, tiempo=t)
+                juego, s, j, ordena=ordena_centro, evalua=evalua_3con_inc, 
+                tiempo=t)
+            )
+        else:
+            t = None
+            while type(t) != int or t < 1:
+                t = int(input("Tiempo total de la partida: "))
+            reloj = Reloj(t, jugadas_restantes=jugadas_restantes_conecta4)
+            jugs.append(lambda juego, s, j, reloj=reloj: minimax_iterativo(
+                juego, s, j, ordena=ordena_centro, evalua=evalua_3con_inc, 
+                reloj=reloj)
             )
         
     g, s_final = juega_dos_jugadores(modelo, jugs[0], jugs[1])
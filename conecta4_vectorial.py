@@ -0,0 +1,298 @@
+"""
+Conecta 4 vectorizado con NumPy, para jugar muchas partidas a la vez
+
+Un lote guarda N partidas como arreglos:
+
+    tableros (N, 42) int8: las casillas con la misma numeración que
+        el estado de conect4.Conecta4 (0 a 6 es el renglón de arriba)
+    alturas (N, 7) int8: fichas en cada columna
+    jugador (N,) int8: jugador en turno (1 o -1)
+    terminado (N,) bool y ganancia (N,) int8: resultado de la partida
+
+Cada jugada de todas las partidas es una sola operación sobre arreglos
+(máscaras de jugadas legales, soltar ficha, detectar ganador, reiniciar
+las partidas terminadas), así que sirve para generar muchas partidas
+de autojuego o posiciones de entrenamiento.
+
+Las políticas reciben el lote y un generador aleatorio y devuelven un
+arreglo (N,) de columnas. Se incluyen una aleatoria, una heurística
+(gana si puede, bloquea si debe, prefiere el centro) y una voraz a una
+jugada sobre una función de evaluación en lote; evalua_3con_lote es
+idéntica a conect4.evalua_3con y evalua_escalar adapta cualquier
+evaluación de un solo estado.
+
+Este módulo necesita NumPy.
+
+"""
+import numpy as np
+
+from conect4 import evalua_3con, PESOS_C4
+
+
+def _ventanas(largo):
+    """
+    Índices de las ventanas de `largo` casillas, con los mismos
+    recorridos que Conecta4.ganancia (largo 4) y evalua_3con (largo 3)
+
+    """
+    n = 7 - largo + 1
+    m = 6 - largo + 1
+    v = [[i + 7 * (j + k) for k in range(largo)]
+         for i in range(7) for j in range(m)]
+    v += [[7 * i + j + k for k in range(largo)]
+          for i in range(6) for j in range(n)]
+    v += [[i + 7 * j + 8 * k for k in range(largo)]
+          for i in range(n) for j in range(m)]
+    v += [[i + 7 * j + 3 + 6 * k for k in range(largo)]
+          for i in range(n) for j in range(m)]
+    return np.array(v, dtype=np.intp)
+
+
+VENTANAS_4 = _ventanas(4)
+VENTANAS_3 = _ventanas(3)
+# Dirección de cada ventana de tres (vertical, horizontal, diagonal,
+# antidiagonal), en el orden en que las genera _ventanas
+DIRECCION_3 = np.repeat(np.arange(4), [28, 30, 20, 20])
+PREFERENCIA_CENTRO = np.array([0, 1, 2, 3, 2, 1, 0], dtype=np.float64)
+
+
+def ganadores(tableros):
+    """
+    Devuelve (N,) con 1 o -1 si ese jugador tiene cuatro en línea, o 0
+
+    """
+    v = tableros[:, VENTANAS_4]
+    suma = v.sum(axis=2, dtype=np.int8)
+    g = np.zeros(len(tableros), dtype=np.int8)
+    g[(suma == 4).any(axis=1)] = 1
+    g[(suma == -4).any(axis=1)] = -1
+    return g
+
+
+def ventanas3_lote(tableros):
+    """
+    Ventanas de tres completas por dirección: (N, 4) del jugador 1 menos
+    las del jugador -1
+
+    """
+    suma = tableros[:, VENTANAS_3].sum(axis=2, dtype=np.int8)
+    completas = (suma == 3).astype(np.int64) - (suma == -3)
+    return np.stack(
+        [completas[:, DIRECCION_3 == d].sum(axis=1) for d in range(4)],
+        axis=1
+    )
+
+
+def evalua_3con_lote(tableros):
+    """
+    Versión en lote de conect4.evalua_3con (mismo resultado, con los
+    mismos pesos)
+
+    """
+    f = ventanas3_lote(tableros)
+    w = PESOS_C4['ventanas3']
+    conect3 = w[0] * f[:, 0] + w[1] * f[:, 1] + w[2] * f[:, 2] + w[3] * f[:, 3]
+    return conect3 / len(VENTANAS_3)
+
+
+def evalua_escalar(evalua=evalua_3con):
+    """
+    Adapta una evaluación de un solo estado (tupla de 42) a una en lote.
+    Hace un ciclo de Python sobre las partidas, por lo que es mucho más
+    lenta que una evaluación vectorizada
+
+    """
+    def evalua_lote(tableros):
+        return np.array([evalua(tuple(t.tolist())) for t in tableros])
+    return evalua_lote
+
+
+class Conecta4Lote:
+    """
+    N partidas de conecta 4 que avanzan juntas
+
+    """
+    def __init__(self, n):
+        self.n = n
+        self.tableros = np.zeros((n, 42), dtype=np.int8)
+        self.alturas = np.zeros((n, 7), dtype=np.int8)
+        self.jugador = np.ones(n, dtype=np.int8)
+        self.terminado = np.zeros(n, dtype=bool)
+        self.ganancia = np.zeros(n, dtype=np.int8)
+
+    def legales(self):
+        """
+        Máscara (N, 7) de columnas legales (todo False si terminó)
+
+        """
+        return (self.alturas < 6) & ~self.terminado[:, None]
+
+    def juega(self, columnas):
+        """
+        Juega una columna en cada partida no terminada y actualiza
+        turno, ganador y partidas terminadas
+
+        Parametros
+        ----------
+        columnas: arreglo (N,) de columnas. Se ignora en las partidas
+            terminadas; en las demás debe ser legal
+
+        """
+        activas = np.flatnonzero(~self.terminado)
+        c = np.asarray(columnas)[activas]
+        if (self.alturas[activas, c] >= 6).any():
+            raise ValueError("Jugada ilegal: columna llena")
+        destino = c + 7 * (5 - self.alturas[activas, c])
+        self.tableros[activas, destino] = self.jugador[activas]
+        self.alturas[activas, c] += 1
+        g = ganadores(self.tableros[activas])
+        lleno = (self.alturas[activas] == 6).all(axis=1)
+        self.ganancia[activas] = g
+        self.terminado[activas] = (g != 0) | lleno
+        self.jugador[activas] = -self.jugador[activas]
+
+    def reinicia(self, mascara=None):
+        """
+        Regresa al estado inicial las partidas de la máscara
+        (por omisión, las terminadas)
+
+        """
+        m = self.terminado.copy() if mascara is None else mascara
+        self.tableros[m] = 0
+        self.alturas[m] = 0
+        self.jugador[m] = 1
+        self.terminado[m] = False
+        self.ganancia[m] = 0
+
+    def estados(self):
+        """
+        Lista de (estado, jugador) en el formato de conect4.Conecta4
+
+        """
+        return [
+            (tuple(t), int(j))
+            for t, j in zip(self.tableros.tolist(), self.jugador.tolist())
+        ]
+
+
+def _elige(puntos, legales, rng):
+    """
+    Columna legal con más puntos por partida, desempatando al azar
+
+    """
+    puntos = puntos + rng.random(puntos.shape) * 1e-6
+    puntos = np.where(legales, puntos, -np.inf)
+    return puntos.argmax(axis=1)
+
+
+def politica_aleatoria(lote, rng):
+    """
+    Cualquier columna legal, con la misma probabilidad
+
+    """
+    return _elige(np.zeros((lote.n, 7)), lote.legales(), rng)
+
+
+def _tras_jugar(lote, c, jugador):
+    """
+    Tableros (N, 42) tras soltar en la columna c una ficha de `jugador`
+    (las columnas llenas devuelven el tablero sin cambios)
+
+    """
+    t = lote.tableros.copy()
+    libre = lote.alturas[:, c] < 6
+    filas = np.flatnonzero(libre)
+    t[filas, c + 7 * (5 - lote.alturas[filas, c])] = jugador[filas]
+    return t
+
+
+def politica_heuristica(lote, rng):
+    """
+    Gana si puede, si no bloquea una victoria inmediata del rival,
+    si no prefiere las columnas del centro
+
+    """
+    puntos = np.tile(PREFERENCIA_CENTRO, (lote.n, 1))
+    j = lote.jugador
+    for c in range(7):
+        gana = ganadores(_tras_jugar(lote, c, j)) == j
+        bloquea = ganadores(_tras_jugar(lote, c, -j)) == -j
+        puntos[:, c] += 1000 * gana + 100 * bloquea
+    return _elige(puntos, lote.legales(), rng)
+
+
+def politica_voraz(evalua_lote=evalua_3con_lote):
+    """
+    Política a una jugada: la columna con mejor evaluación para el
+    jugador en turno. evalua_lote recibe tableros (M, 42) y evalúa
+    para el jugador 1, como evalua_3con
+
+    """
+    def politica(lote, rng):
+        puntos = np.empty((lote.n, 7))
+        for c in range(7):
+            t = _tras_jugar(lote, c, lote.jugador)
+            g = ganadores(t)
+            puntos[:, c] = lote.jugador * np.where(g != 0, g, evalua_lote(t))
+        return _elige(puntos, lote.legales(), rng)
+    return politica
+
+
+def autojuego(
+    politica1, politica2, n=1024, partidas=10000, rng=None, registra=False
+    ):
+    """
+    Juega partidas en lotes de n hasta completar `partidas`
+
+    Parametros
+    ----------
+    politica1, politica2: Políticas para el jugador 1 y -1
+    n (int): Partidas simultáneas
+    partidas (int): Partidas por completar
+    rng (numpy.random.Generator): Generador aleatorio
+    registra (bool): Si True, guarda todas las posiciones
+
+    Regresa
+    -------
+    ganancias (partidas,) int8 y, si registra, también
+    (tableros (M, 42) int8, jugadores (M,) int8, resultado (M,) int8)
+    con el resultado final (para el jugador 1) de la partida de cada
+    posición
+
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    lote = Conecta4Lote(n)
+    ganancias = np.zeros(partidas, dtype=np.int8)
+    episodio = np.arange(n)
+    siguiente = n
+    # Solo se juegan los episodios 0 .. partidas - 1: al llegar a ese
+    # número ya no se reinician las partidas que terminan y se espera a
+    # que acaben las demás (si no, sobran partidas cortas)
+    activa = episodio < partidas
+    lote.terminado[~activa] = True
+    posiciones, jugadores, episodios = [], [], []
+    while activa.any():
+        if registra:
+            posiciones.append(lote.tableros[activa])
+            jugadores.append(lote.jugador[activa])
+            episodios.append(episodio[activa])
+        uno = lote.jugador == 1
+        columnas = np.where(
+            uno, politica1(lote, rng), politica2(lote, rng)
+        )
+        lote.juega(columnas)
+        fin = np.flatnonzero(lote.terminado & activa)
+        ganancias[episodio[fin]] = lote.ganancia[fin]
+        activa[fin] = False
+        nuevas = fin[:max(0, partidas - siguiente)]
+        episodio[nuevas] = np.arange(siguiente, siguiente + len(nuevas))
+        siguiente += len(nuevas)
+        activa[nuevas] = True
+        lote.reinicia(nuevas)
+    if not registra:
+        return ganancias
+    episodios = np.concatenate(episodios)
+    return ganancias, (
+        np.concatenate(posiciones), np.concatenate(jugadores),
+        ganancias[episodios]
+    )
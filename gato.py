@@ -43,18 +43,7 @@ class Gato(ModeloJuegoZT2):
         Devuelve True si es terminal el estado actual,
 
         """
-        if 0 not in s:
-            return True
-        if s[0] == s[4] == s[8] != 0:
-            return True
-        if s[2] == s[4] == s[6] != 0:
-            return True
-        for i in range(3):
-            if s[3 * i] == s[3 * i + 1] == s[3 * i + 2] != 0:
-                return True
-            if s[i] == s[i + 3] == s[i + 6] != 0:
-                return True
-        return False
+        return self.resultado(s) != None
 
     def ganancia(self, s):
         """
@@ -71,6 +60,17 @@ class Gato(ModeloJuegoZT2):
             if s[i] == s[i + 3] == s[i + 6] != 0:
                 return s[i]
         return 0    
+
+    def resultado(self, s):
+        """
+        Devuelve None si el estado no es terminal, y si lo es la
+        ganancia para el jugador 1, revisando las líneas una sola vez
+
+        """
+        g = self.ganancia(s)
+        if g != 0 or 0 not in s:
+            return g
+        return None
     
 def pprint_gato(s):
     """
@@ -100,6 +100,13 @@ def jugador_manual_gato(juego, s, j):
         jugada = int(input("Jugada: "))
     return jugada
 
+def jugadas_restantes_gato(s):
+    """
+    Estima las jugadas que le faltan a un jugador (para el reloj)
+
+    """
+    return (s.count(0) + 1) // 2
+
 def jugador_minimax_gato(juego, s, j):
     """
     Jugador minimax para el juego del gato
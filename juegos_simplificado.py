@@ -54,6 +54,19 @@ class ModeloJuegoZT2:
         """
         raise NotImplementedError("Hay que desarrollar este método, pues")
 
+    def resultado(self, s):
+        """
+        Devuelve None si el estado s no es terminal, y si lo es, la
+        ganancia para el jugador 1
+        
+        Los algoritmos de búsqueda usan este método para no revisar dos
+        veces el estado (terminal y luego ganancia). Por omisión usa
+        terminal y ganancia; conviene sobreescribirlo con una versión
+        que recorra el estado una sola vez.
+        
+        """
+        return self.ganancia(s) if self.terminal(s) else None
+
 
 def juega_dos_jugadores(juego, jugador1, jugador2):
     """
@@ -65,11 +78,13 @@ def juega_dos_jugadores(juego, jugador1, jugador2):
     
     """
     s, j = juego.inicializa()
-    while not juego.terminal(s):
+    g = juego.resultado(s)
+    while g == None:
         a = jugador1(juego, s, j) if j == 1 else jugador2(juego, s, j)
         s = juego.transicion(s, a, j)
         j = -j
-    return juego.ganancia(s), s
+        g = juego.resultado(s)
+    return g, s
 
 
 def minimax(juego, estado, jugador):
@@ -79,8 +94,9 @@ def minimax(juego, estado, jugador):
     """
     j = jugador
     def max_val(estado, jugador):
-        if juego.terminal(estado):
-            return j * juego.ganancia(estado)
+        g = juego.resultado(estado)
+        if g != None:
+            return j * g
         v = -1e10
         for a in juego.jugadas_legales(estado, jugador):
             v = max(
@@ -93,8 +109,9 @@ def minimax(juego, estado, jugador):
         return v
     
     def min_val(estado, jugador):
-        if juego.terminal(estado):
-            return j * juego.ganancia(estado)
+        g = juego.resultado(estado)
+        if g != None:
+            return j * g
         v = 1e10
         for a in juego.jugadas_legales(estado, jugador):
             v = min(
@@ -122,8 +139,9 @@ def alpha_beta(juego, estado, jugador, ordena=None):
     """
     j = jugador
     def max_val(estado, jugador, alpha, beta):
-        if juego.terminal(estado):
-            return j * juego.ganancia(estado)
+        g = juego.resultado(estado)
+        if g != None:
+            return j * g
         v = -1e10
         jugadas = list(juego.jugadas_legales(estado, jugador))
         if ordena:
@@ -145,8 +163,9 @@ def alpha_beta(juego, estado, jugador, ordena=None):
         return v
     
     def min_val(estado, jugador, alpha, beta):
-        if juego.terminal(estado):
-            return j * juego.ganancia(estado)
+        g = juego.resultado(estado)
+        if g != None:
+            return j * g
         v = 1e10
         jugadas = list(juego.jugadas_legales(estado, jugador))
         if ordena:
@@ -7,15 +7,51 @@ Modulo con el minimax con algunos los poderes
     4- Busqueda iterativa
     5- Tablas de transposicion
     6- Trazabilidad
+    7- Heuristica de historia
+    8- Limites de tiempo y de nodos
+    9- Busqueda selectiva (reducciones y poda de futilidad), opcional
 """
 from random import shuffle
 from time import time
+from transposicion import TablaTransposicion, PROF_MAX
+from transposicion import EXACTA, INFERIOR, SUPERIOR
+
+
+class BusquedaInterrumpida(Exception):
+    """
+    Se lanza cuando una búsqueda agota su límite de tiempo o de nodos
+    
+    """
+
+
+class Limite:
+    """
+    Límite de tiempo (en segundos) y/o de nodos para una búsqueda
+
+    negamax llama a cuenta() en cada nodo, y cuando se agota el límite
+    se lanza BusquedaInterrumpida. El reloj solo se consulta cada
+    256 nodos.
+
+    """
+    def __init__(self, tiempo=None, nodos=None):
+        self.fin = None if tiempo == None else time() + tiempo
+        self.max_nodos = nodos
+        self.nodos = 0
+
+    def cuenta(self):
+        self.nodos += 1
+        if self.max_nodos != None and self.nodos > self.max_nodos:
+            raise BusquedaInterrumpida()
+        if self.fin != None and self.nodos & 255 == 0 and time() > self.fin:
+            raise BusquedaInterrumpida()
+
 
 def negamax(
     juego, estado, jugador,
     alpha=-1e10, beta=1e10, ordena=None, 
     d=None, evalua=None,
-    transp={}, traza=[]
+    transp={}, traza=[], historia=None, limite=None,
+    reducciones=False, futilidad=None
     ):
     """
     Devuelve la mejor jugada para el jugador en el estado
@@ -33,8 +69,27 @@ def negamax(
         Si None, busca hasta el final
     evalua: function de evaluación
         Siempre evalua para el jugador 1
-    transp (dict): Tabla de transposición
+    transp (dict o TablaTransposicion): Tabla de transposición.
+        Con una TablaTransposicion se guardan también la cota y la
+        mejor jugada, que se usa para ordenar
     traza (list): Trazabilidad
+    historia (dict): Tabla de historia {(jugador, jugada): peso}.
+        Se actualiza con las jugadas que provocan un corte y se usa
+        para ordenar (respetando el orden de ordena en los empates)
+    limite (Limite): Límite de tiempo o nodos. Al agotarse se lanza
+        BusquedaInterrumpida
+    reducciones (bool): Reducciones de jugadas tardías. A partir de
+        d = 3, las jugadas de la cuarta en adelante (en el orden de
+        búsqueda) se buscan con un nivel menos, y solo si superan a
+        alpha se vuelven a buscar a profundidad completa
+    futilidad (tuple): Márgenes de futilidad para d = 1, 2, ... (en
+        unidades de evalua). Si la evaluación estática menos el margen
+        ya supera a beta se corta (futilidad inversa); si más el margen
+        no alcanza a alpha, de las jugadas solo se buscan las que
+        terminan el juego (futilidad)
+
+    Con reducciones o futilidad la búsqueda deja de ser exacta; por
+    omisión ambas están apagadas.
     
     Regresa
     -------
@@ -47,77 +102,364 @@ def negamax(
         raise ValueError("ordena debe ser una función")
     if type(evalua) != type(None) and type(evalua) != type(lambda x: x):
         raise ValueError("evalua debe ser una función")
-    if type(transp) != dict:
-        raise ValueError("transp debe ser un diccionario")
+    if type(transp) != dict and not isinstance(transp, TablaTransposicion):
+        raise ValueError(
+            "transp debe ser un diccionario o una TablaTransposicion"
+        )
     if type(traza) != list: 
         raise ValueError("traza debe ser una lista")
 
-    if juego.terminal(estado):
-        return [], jugador * juego.ganancia(estado)
+    if limite != None:
+        limite.cuenta()
+    g = juego.resultado(estado)
+    if g != None:
+        return [], jugador * g
     if d == 0:
         return [], jugador * evalua(estado)
-    if d != None and estado in transp and transp[estado][1] >= d:
-        return [], transp[estado][0]
+    legales = list(juego.jugadas_legales(estado, jugador))
+    a_tt = None
+    if type(transp) == dict:
+        if d != None and estado in transp and transp[estado][1] >= d:
+            return [], transp[estado][0]
+    else:
+        entrada = transp.busca(estado)
+        if entrada != None:
+            v_tt, d_tt, cota, i_tt = entrada
+            if i_tt != None and i_tt < len(legales):
+                a_tt = legales[i_tt]
+            if d_tt >= (PROF_MAX if d == None else d) and (
+                cota == EXACTA
+                or (cota == INFERIOR and v_tt >= beta)
+                or (cota == SUPERIOR and v_tt <= alpha)
+            ):
+                return ([a_tt] if a_tt != None else []), v_tt
     
-    v = -1e10
-    jugadas = list(juego.jugadas_legales(estado, jugador))
+    v, alpha0 = -1e10, alpha
+    futil = False
+    if futilidad != None and d != None and d <= len(futilidad):
+        e = jugador * evalua(estado)
+        margen = futilidad[d - 1]
+        if e - margen >= beta:
+            return [], e - margen
+        futil = e + margen <= alpha
+        if futil:
+            v = e + margen
+    jugadas = legales[:]
     if ordena != None:
         jugadas = ordena(jugadas, jugador)
     else:
         shuffle(jugadas)
+    if historia:
+        jugadas.sort(key=lambda a: -historia.get((jugador, a), 0))
+    if a_tt != None:
+        jugadas = [a_tt] + [a for a in jugadas if a != a_tt]
     if traza:
         a_pref = traza.pop(0)
         if a_pref in jugadas:
             jugadas = [a_pref] + [a for a in jugadas if a != a_pref]
-    for a in jugadas:
+    mejor, mejores = None, []
+    for i, a in enumerate(jugadas):
+        hijo = juego.transicion(estado, a, jugador)
+        if futil and juego.resultado(hijo) == None:
+            continue
+        reducida = reducciones and d != None and d >= 3 and i >= 3
         traza_actual, v2 = negamax(
-            juego, juego.transicion(estado, a, jugador), -jugador, 
-            -beta, -alpha, ordena, d if d == None else d - 1, 
-            evalua, transp, traza
+            juego, hijo, -jugador, 
+            -beta, -alpha, ordena, 
+            d if d == None else d - (2 if reducida else 1), 
+            evalua, transp, traza, historia, limite, reducciones, futilidad
         )
         v2 = -v2
+        if reducida and v2 > alpha:
+            traza_actual, v2 = negamax(
+                juego, hijo, -jugador, -beta, -alpha, ordena, d - 1,
+                evalua, transp, traza, historia, limite, reducciones,
+                futilidad
+            )
+            v2 = -v2
         if v2 > v:
             v = v2
             mejor = a
             mejores = traza_actual[:]
         if v >= beta:
+            if historia != None:
+                historia[(jugador, a)] = (
+                    historia.get((jugador, a), 0) + (1 if d == None else d * d)
+                )
             break
         if v > alpha:
             alpha = v
-    transp[estado] = (v, d)
+    if mejor == None:
+        # Todas las jugadas se podaron por futilidad: v es una cota
+        if type(transp) != dict:
+            transp.guarda(estado, v, d, SUPERIOR)
+        return [], v
+    if type(transp) == dict:
+        transp[estado] = (v, d)
+    else:
+        cota = (
+            SUPERIOR if v <= alpha0 else INFERIOR if v >= beta else EXACTA
+        )
+        transp.guarda(estado, v, d, cota, legales.index(mejor))
     return [mejor] + mejores, v 
 
 
 def jugador_negamax(
-    juego, estado, jugador, ordena=None, d=None, evalua=None
+    juego, estado, jugador, ordena=None, d=None, evalua=None, transp=None
     ):
     """
     Funcion burrito para el negamax
+
+    Si transp es None se usa un diccionario nuevo en cada jugada. Con
+    una TablaTransposicion con archivo (ver catalogo.tabla_persistente)
+    los resultados se conservan entre ejecuciones
     
     """
     traza, _ = negamax(
         juego=juego, estado=estado, jugador=jugador, 
         alpha=-1e10, beta=1e10, ordena=ordena, d=d, 
-        evalua=evalua, transp={}, traza=[])
+        evalua=evalua, transp={} if transp == None else transp, traza=[])
     return traza[0]
 
 
 def minimax_iterativo(
     juego, estado, jugador, tiempo=10,
-    ordena=None, d=None, evalua=None,
+    ordena=None, d=None, evalua=None, transp=None, reloj=None
     ):  
     """
     Devuelve la mejor jugada para el jugador en el estado
     acotando a un periodo de tiempo
+
+    Si transp es None se usa un diccionario nuevo en cada iteración,
+    con una TablaTransposicion se comparte entre iteraciones (y entre
+    ejecuciones si la tabla tiene archivo)
+
+    Si se da un reloj (reloj.Reloj) se ignora tiempo y el reloj decide
+    cuánto tiempo usar en esta jugada
     
     """
+    if reloj != None:
+        traza, _, _, _ = busqueda_iterativa(
+            juego, estado, jugador, ordena=ordena, evalua=evalua,
+            transp=transp, reloj=reloj
+        )
+        return traza[0]
     t0 = time()
     d, traza = 2, []
     while time() - t0 < tiempo/2:
         traza, v = negamax(
             juego=juego, estado=estado, jugador=jugador,  
             alpha=-1e10, beta=1e10, ordena=ordena, d=d, evalua=evalua, 
-            transp={}, traza=traza
+            transp={} if transp == None else transp, traza=traza
         )
         d += 1
     return traza[0]
+
+
+def busqueda_iterativa(
+    juego, estado, jugador, tiempo=None, nodos=None, d_max=None,
+    ordena=None, evalua=None, transp=None, historia=None, reloj=None,
+    reducciones=False, futilidad=None
+    ):
+    """
+    Negamax con profundización iterativa, limitado en tiempo y/o nodos
+    o administrado por un reloj de partida
+    
+    Parametros
+    ----------
+    tiempo (float): Segundos disponibles (None, sin límite)
+    nodos (int): Nodos disponibles (None, sin límite)
+    d_max (int): Profundidad máxima (None, sin límite)
+    transp: Tabla de transposición compartida entre iteraciones.
+        Si None, se usa un diccionario nuevo en cada iteración
+    historia (dict): Tabla de historia compartida entre iteraciones
+    reloj (reloj.Reloj): Reloj de partida. Decide el tiempo de la
+        jugada (además de tiempo, si se da) y se descuenta al terminar
+    
+    El resto de los parámetros son los de negamax (reducciones y
+    futilidad solo se usan con evalua). Si evalua es None se hace una
+    sola búsqueda hasta el final. La búsqueda se detiene
+    antes de d_max si el valor ya está decidido (ganancia de un estado
+    terminal) o si se agota el límite; en ese caso se devuelve el
+    resultado de la última iteración completa (la profundidad 1 siempre
+    se completa).
+    
+    Regresa
+    -------
+    tuple: (lista mejores jugadas, valor, profundidad, nodos)
+    
+    """
+    if reloj != None:
+        forzada = reloj.inicia(juego, estado, jugador)
+        tiempo = reloj.duro() if tiempo == None else min(tiempo, reloj.duro())
+    limite = Limite(tiempo, nodos)
+    contador = Limite()  # Sin límite, solo cuenta los nodos obligatorios
+    if reloj != None and forzada:
+        reloj.termina()
+        return list(juego.jugadas_legales(estado, jugador)), None, 0, 0
+    if evalua == None:
+        traza, v = negamax(
+            juego, estado, jugador, ordena=ordena,
+            transp={} if transp == None else transp, traza=[],
+            historia=historia, limite=contador
+        )
+        if reloj != None:
+            reloj.termina()
+        if isinstance(transp, TablaTransposicion):
+            traza = _completa_pv(juego, estado, jugador, traza, transp, None)
+        return traza, v, None, contador.nodos
+    traza, v, d = [], None, 0
+    while d_max == None or d < d_max:
+        try:
+            traza_nueva, v_nuevo = negamax(
+                juego, estado, jugador, ordena=ordena, d=d + 1,
+                evalua=evalua, transp={} if transp == None else transp,
+                traza=traza[:], historia=historia,
+                limite=limite if d > 0 else contador,
+                reducciones=reducciones, futilidad=futilidad
+            )
+        except BusquedaInterrumpida:
+            break
+        traza, v, d = traza_nueva, v_nuevo, d + 1
+        if abs(v) >= 1:
+            break
+        if reloj != None and not reloj.continua(d, traza[0], v):
+            break
+    if reloj != None:
+        reloj.termina()
+    if isinstance(transp, TablaTransposicion):
+        # Con la tabla llena negamax corta la traza en la raíz
+        traza = _completa_pv(juego, estado, jugador, traza, transp, d)
+    return traza, v, d, limite.nodos + contador.nodos
+
+
+def multipv(
+    juego, estado, jugador, k=3, d_max=None, tiempo=None, nodos=None,
+    ordena=None, evalua=None, transp=None, historia=None
+    ):
+    """
+    Generador de análisis con varias variantes principales (multi-PV)
+
+    En cada profundidad de la profundización iterativa busca todas las
+    jugadas del estado, en el orden de la iteración anterior, compartiendo
+    la tabla de transposición. Las primeras k se buscan con ventana
+    completa; las demás solo tienen que superar a la k-ésima, así que se
+    buscan con alpha igual a su valor y únicamente las que lo superan
+    cuestan una búsqueda exacta.
+
+    Parametros
+    ----------
+    k (int): Número de jugadas con valor exacto
+    d_max, tiempo, nodos: Límites, como en busqueda_iterativa
+    transp (TablaTransposicion): Si None se crea una de 16 MB. No se
+        acepta un diccionario, porque no guarda si los valores son cotas
+        y aquí se busca con ventanas distintas
+
+    El resto de los parámetros son los de negamax.
+
+    Regresa (genera)
+    ----------------
+    Por cada profundidad terminada: (d, [(jugada, valor, pv), ...]) con
+    las k mejores jugadas ordenadas de mejor a peor, con su valor para
+    el jugador y su variante principal (que empieza con la jugada)
+
+    """
+    if transp == None:
+        transp = TablaTransposicion(16)
+    if not isinstance(transp, TablaTransposicion):
+        raise ValueError("transp debe ser una TablaTransposicion")
+    limite = Limite(tiempo, nodos)
+    jugadas = list(juego.jugadas_legales(estado, jugador))
+    if ordena != None:
+        jugadas = ordena(jugadas, jugador)
+    else:
+        shuffle(jugadas)
+    pvs = {a: [] for a in jugadas}
+    d = 0
+    while d_max == None or d < d_max:
+        d = None if evalua == None else d + 1
+        exactas, cotas = [], []
+        try:
+            for a in jugadas:
+                corte = exactas[k - 1][1] if len(exactas) >= k else -1e10
+                traza, v = negamax(
+                    juego, juego.transicion(estado, a, jugador), -jugador,
+                    alpha=-1e10, beta=-corte, ordena=ordena,
+                    d=None if d == None else d - 1, evalua=evalua,
+                    transp=transp, traza=pvs[a][1:], historia=historia,
+                    limite=limite
+                )
+                v = -v
+                if v > corte:
+                    exactas.append((a, v))
+                    exactas.sort(key=lambda x: -x[1])
+                else:
+                    cotas.append((a, v))
+                pvs[a] = _completa_pv(
+                    juego, estado, jugador, [a] + traza, transp, d
+                )
+        except BusquedaInterrumpida:
+            return
+        jugadas = [a for a, _ in exactas] + [
+            a for a, _ in sorted(cotas, key=lambda x: -x[1])
+        ]
+        yield d, [(a, v, pvs[a]) for a, v in exactas[:k]]
+        if d == None or all(abs(v) >= 1 for _, v in exactas[:k]):
+            return
+
+
+def analiza(
+    juego, estado, jugador, k=3, d_max=None, tiempo=None, nodos=None,
+    ordena=None, evalua=None, transp=None, historia=None, reporta=None
+    ):
+    """
+    Devuelve las k mejores jugadas con su valor exacto y su variante
+    principal, usando multipv
+
+    Parametros
+    ----------
+    reporta (function): Si no es None se llama con (d, resultados) al
+        terminar cada profundidad, para mostrar resultados parciales
+
+    El resto de los parámetros son los de multipv. Si se agota el
+    límite se devuelve lo de la última profundidad terminada.
+
+    Regresa
+    -------
+    tuple: (d, [(jugada, valor, pv), ...])
+
+    """
+    ultimo = (0, [])
+    for ultimo in multipv(
+        juego, estado, jugador, k, d_max, tiempo, nodos,
+        ordena, evalua, transp, historia
+    ):
+        if reporta != None:
+            reporta(*ultimo)
+    return ultimo
+
+
+def _completa_pv(juego, estado, jugador, pv, transp, d):
+    """
+    Alarga una variante principal siguiendo las mejores jugadas
+    guardadas en la tabla de transposición (cuando la búsqueda cortó
+    la traza por encontrar el valor en la tabla)
+
+    """
+    for a in pv:
+        estado = juego.transicion(estado, a, jugador)
+        jugador = -jugador
+    while d == None or len(pv) < d:
+        if juego.resultado(estado) != None:
+            break
+        entrada = transp.busca(estado)
+        if entrada == None or entrada[3] == None:
+            break
+        legales = list(juego.jugadas_legales(estado, jugador))
+        if entrada[3] >= len(legales):
+            break
+        a = legales[entrada[3]]
+        pv.append(a)
+        estado = juego.transicion(estado, a, jugador)
+        jugador = -jugador
+    return pv
@@ -0,0 +1,264 @@
+"""
+Búsqueda por números de prueba (df-pn) para demostrar ganancias forzadas
+
+En lugar de buscar hasta una profundidad y evaluar, cada nodo guarda
+cuántas hojas faltan por demostrar (número de prueba) o por refutar
+(número de refutación) para que el objetivo se cumpla, y se expande
+siempre el nodo más prometedor. Las líneas forzadas, estrechas y
+profundas, se demuestran con muchos menos nodos que con negamax.
+
+Se usa la variante en profundidad (df-pn) con una tabla de nodos
+acotada: cuando la tabla se llena se descartan los nodos no resueltos
+que costaron menos trabajo.
+
+Con dos búsquedas (ganar; no perder) se obtiene el valor exacto de la
+posición para el jugador en turno:
+
+    valor, jugada, nodos = resuelve(juego, estado, jugador, nodos=50000)
+
+    valor: 1 (gana), 0 (empata), -1 (pierde) o None (sin resolver)
+
+Funciona con cualquier ModeloJuegoZT2, así que sirve como verificación
+previa a la búsqueda heurística (ver con_prueba) y como solucionador
+de finales de gato, conecta 4 y UTTT:
+
+    python numeros_prueba.py conecta4 '4444' --nodos 200000
+
+"""
+from time import time
+from minimax import Limite, BusquedaInterrumpida
+
+INF = 10 ** 9
+
+
+class _Prueba:
+    """
+    Una búsqueda df-pn para un objetivo del jugador raíz
+
+    phi y delta son los números de prueba y refutación vistos desde el
+    jugador en turno en cada nodo (phi = 0: se cumple lo que le conviene
+    a ese jugador).
+
+    """
+    def __init__(self, juego, raiz, objetivo, ordena, limite, max_tabla):
+        self.juego = juego
+        self.raiz = raiz
+        self.objetivo = objetivo
+        self.ordena = ordena
+        self.limite = limite
+        self.max_tabla = max_tabla
+        self.tabla = {}
+
+    def valores(self, estado, jugador):
+        """
+        (phi, delta) de un nodo, de la tabla, de su resultado si es
+        terminal, o (1, 1) si es nuevo
+
+        """
+        clave = (estado, jugador)
+        if clave in self.tabla:
+            phi, delta, _ = self.tabla[clave]
+            return phi, delta
+        g = self.juego.resultado(estado)
+        if g == None:
+            return 1, 1
+        exito = self.objetivo(g * self.raiz)
+        valor = (0, INF) if exito == (jugador == self.raiz) else (INF, 0)
+        self.tabla[clave] = (*valor, 0)
+        return valor
+
+    def guarda(self, estado, jugador, phi, delta, trabajo):
+        clave = (estado, jugador)
+        self.tabla[clave] = (phi, delta, trabajo)
+        if len(self.tabla) > self.max_tabla:
+            self.recolecta(clave)
+
+    def recolecta(self, conserva):
+        """
+        Libera la mitad de la tabla: primero los nodos no resueltos con
+        menos trabajo acumulado. Nunca borra el nodo recién guardado
+
+        """
+        orden = sorted(
+            self.tabla.items(),
+            key=lambda e: (e[1][0] == 0 or e[1][1] == 0, e[1][2])
+        )
+        for clave, _ in orden[:len(orden) // 2]:
+            if clave != conserva:
+                del self.tabla[clave]
+
+    def hijos(self, estado, jugador):
+        jugadas = list(self.juego.jugadas_legales(estado, jugador))
+        if self.ordena != None:
+            jugadas = self.ordena(jugadas, jugador)
+        return [
+            (a, self.juego.transicion(estado, a, jugador)) for a in jugadas
+        ]
+
+    def mid(self, estado, jugador, umbral_phi, umbral_delta):
+        """
+        Expande el nodo hasta que phi o delta alcanzan su umbral
+
+        Regresa
+        -------
+        (phi, delta, trabajo)
+
+        """
+        self.limite.cuenta()
+        hijos = self.hijos(estado, jugador)
+        trabajo = 1
+        while True:
+            phi, delta = INF, 0
+            mejor, phi_mejor, delta_2 = None, INF, INF
+            for i, (_, s) in enumerate(hijos):
+                phi_h, delta_h = self.valores(s, -jugador)
+                delta = min(delta + phi_h, INF)
+                if delta_h < phi:
+                    phi, delta_2 = delta_h, phi
+                    mejor, phi_mejor = i, phi_h
+                elif delta_h < delta_2:
+                    delta_2 = delta_h
+            if phi == 0:
+                delta = INF
+            elif delta == 0:
+                phi = INF
+            if phi >= umbral_phi or delta >= umbral_delta:
+                self.guarda(estado, jugador, phi, delta, trabajo)
+                return phi, delta, trabajo
+            s = hijos[mejor][1]
+            _, _, t = self.mid(
+                s, -jugador,
+                umbral_delta - delta + phi_mejor,
+                min(umbral_phi, delta_2 + 1)
+            )
+            trabajo += t
+
+    def demuestra(self, estado, jugador):
+        """
+        Regresa (True, jugada), (False, None) o (None, None) si se
+        agotan los límites
+
+        """
+        try:
+            phi, _ = self.valores(estado, jugador)
+            if phi == 1:
+                phi, _, _ = self.mid(estado, jugador, INF, INF)
+        except BusquedaInterrumpida:
+            return None, None
+        if phi != 0:
+            return False, None
+        for a, s in self.hijos(estado, jugador):
+            if self.valores(s, -jugador)[1] == 0:
+                return True, a
+        return True, None
+
+
+def demuestra(
+    juego, estado, jugador, objetivo, ordena=None, nodos=None, tiempo=None,
+    max_tabla=1_000_000
+    ):
+    """
+    Intenta demostrar que el jugador en turno alcanza el objetivo
+
+    Parametros
+    ----------
+    juego (ModeloJuegoZT2): Modelo del juego
+    estado, jugador: Posición a demostrar
+    objetivo (function): Recibe la ganancia final para el jugador y
+        regresa True si se cumple el objetivo
+    ordena (function): Ordenamiento de jugadas (como en negamax)
+    nodos, tiempo: Límites de la búsqueda (None, sin límite). Se
+        cuentan los nodos expandidos, y cada uno genera todas sus
+        jugadas
+    max_tabla (int): Máximo de nodos en la tabla. Si es mucho menor
+        que el árbol de la demostración la búsqueda puede no avanzar,
+        por eso conviene dar también un límite
+
+    Regresa
+    -------
+    (demostrado, jugada, nodos): demostrado es True, False o None (si se
+        agotó el límite); jugada es la que cumple el objetivo
+
+    """
+    limite = Limite(tiempo, nodos)
+    prueba = _Prueba(juego, jugador, objetivo, ordena, limite, max_tabla)
+    demostrado, jugada = prueba.demuestra(estado, jugador)
+    return demostrado, jugada, limite.nodos
+
+
+def resuelve(
+    juego, estado, jugador, ordena=None, nodos=None, tiempo=None,
+    max_tabla=1_000_000
+    ):
+    """
+    Valor exacto de la posición para el jugador en turno, con dos
+    búsquedas (ganar; no perder) que comparten los límites de nodos y
+    de tiempo
+
+    Regresa
+    -------
+    (valor, jugada, nodos): valor es 1, 0, -1 o None si no se resolvió;
+        jugada es una que logra el valor (None si pierde)
+
+    """
+    g = juego.resultado(estado)
+    if g != None:
+        return g * jugador, None, 0
+    inicio = time()
+    gana, jugada, n = demuestra(
+        juego, estado, jugador, lambda g: g > 0, ordena, nodos, tiempo,
+        max_tabla
+    )
+    if gana != False:
+        return (1 if gana else None), jugada, n
+    resto = None if nodos == None else nodos - n
+    restante = None if tiempo == None else max(0, tiempo - (time() - inicio))
+    empata, jugada, m = demuestra(
+        juego, estado, jugador, lambda g: g >= 0, ordena, resto, restante,
+        max_tabla
+    )
+    valor = {True: 0, False: -1, None: None}[empata]
+    return valor, jugada, n + m
+
+
+def con_prueba(jugador_base, nodos=20000, ordena=None):
+    """
+    Agrega a un jugador (función de juego, estado y jugador) una
+    verificación previa con números de prueba: si la posición se
+    resuelve como ganada o empatada se juega la jugada demostrada, y si
+    no, decide el jugador original
+
+    """
+    def jugador_prueba(juego, estado, jugador):
+        valor, jugada, _ = resuelve(
+            juego, estado, jugador, ordena=ordena, nodos=nodos
+        )
+        if valor != None and valor >= 0 and jugada != None:
+            return jugada
+        return jugador_base(juego, estado, jugador)
+    return jugador_prueba
+
+
+if __name__ == '__main__':
+    import argparse
+    from catalogo import JUEGOS, posicion
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('juego', choices=list(JUEGOS))
+    parser.add_argument('jugadas', nargs='?', default='',
+                        help="Jugadas desde el estado inicial")
+    parser.add_argument('--nodos', type=int, help="Límite de nodos")
+    parser.add_argument('--tiempo', type=float, help="Límite en segundos")
+    parser.add_argument('--tabla', type=int, default=1_000_000,
+                        help="Máximo de nodos en la tabla")
+    args = parser.parse_args()
+
+    modelo, s, j = posicion(args.juego, args.jugadas)
+    t0 = time()
+    valor, jugada, n = resuelve(
+        modelo, s, j, ordena=JUEGOS[args.juego]['ordena'], nodos=args.nodos,
+        tiempo=args.tiempo, max_tabla=args.tabla
+    )
+    nombres = {1: 'gana', 0: 'empata', -1: 'pierde', None: 'sin resolver'}
+    print(f"Jugador {j}: {nombres[valor]}, jugada {jugada}, "
+          f"{n} nodos, {time() - t0:.2f}s")
@@ -0,0 +1,53 @@
+"""
+Pesos de las funciones de evaluación
+
+Los módulos de cada juego leen sus pesos una sola vez, al importarse,
+desde pesos.json (junto a este módulo, o el archivo que indique la
+variable de ambiente PESOS_JUEGOS). Si el archivo no existe o no trae
+pesos para un juego se usan los de siempre, así que sin archivo las
+evaluaciones no cambian. El archivo lo escribe ajusta_pesos.py.
+
+"""
+import os
+import json
+
+ARCHIVO = os.environ.get(
+    'PESOS_JUEGOS',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pesos.json')
+)
+
+
+def carga_pesos(juego, omision, archivo=None):
+    """
+    Devuelve los pesos del juego, completando con los de omisión
+
+    Parametros
+    ----------
+    juego (str): Nombre del juego en el archivo
+    omision (dict): Pesos de siempre; solo se leen estas llaves
+    archivo (str): Archivo a leer (si None, ARCHIVO)
+
+    """
+    try:
+        with open(archivo or ARCHIVO) as f:
+            datos = json.load(f).get(juego, {})
+    except FileNotFoundError:
+        datos = {}
+    return {k: datos.get(k, v) for k, v in omision.items()}
+
+
+def guarda_pesos(juego, pesos, archivo=None):
+    """
+    Escribe los pesos del juego en el archivo, conservando los de los
+    demás juegos
+
+    """
+    archivo = archivo or ARCHIVO
+    try:
+        with open(archivo) as f:
+            datos = json.load(f)
+    except FileNotFoundError:
+        datos = {}
+    datos[juego] = pesos
+    with open(archivo, 'w') as f:
+        json.dump(datos, f, indent=4)
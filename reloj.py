@@ -0,0 +1,131 @@
+"""
+Administración del tiempo de una partida completa
+
+En lugar de un tiempo fijo por jugada, el reloj reparte el tiempo total
+de la partida (más un incremento opcional por jugada) entre las
+jugadas que se espera que falten, y dentro de cada jugada decide
+después de cada iteración de la profundización iterativa si vale la
+pena otra:
+
+    1- Si solo hay una jugada legal se juega sin buscar
+    2- Si el valor ya está decidido (se encontró una ganancia) se para
+    3- Si la mejor jugada se mantiene varias iteraciones se usa menos
+       tiempo, y si cambia se usa más
+    4- Si el valor cae respecto a la iteración anterior se extiende
+    5- No se empieza una iteración que no se espera terminar dentro
+       del máximo de la jugada
+
+Uso:
+
+    reloj = Reloj(total=60, incremento=1)
+    jugada = minimax_iterativo(juego, s, j, evalua=..., reloj=reloj)
+
+"""
+from time import time
+
+
+class Reloj:
+    """
+    Reloj de partida para un jugador
+
+    Parametros
+    ----------
+    total (float): Segundos para toda la partida
+    incremento (float): Segundos que se suman después de cada jugada
+    jugadas_restantes (function): Estima cuántas jugadas le faltan al
+        jugador desde un estado. Si None, se suponen 20
+    margen (float): Segundos que nunca se usan (seguridad)
+    estable (int): Iteraciones con la misma mejor jugada para
+        considerarla estable
+    caida (float): Caída del valor entre iteraciones que provoca
+        una extensión
+
+    """
+    def __init__(
+        self, total, incremento=0, jugadas_restantes=None,
+        margen=0.05, estable=3, caida=0.02
+        ):
+        self.restante = total
+        self.incremento = incremento
+        self.jugadas_restantes = jugadas_restantes
+        self.margen = margen
+        self.estable = estable
+        self.caida = caida
+        self.t0 = None
+
+    def inicia(self, juego, estado, jugador):
+        """
+        Empieza a contar una jugada y calcula su presupuesto
+
+        Regresa
+        -------
+        bool: True si la jugada es forzada (una sola jugada legal)
+
+        """
+        self.t0 = time()
+        n = 20 if self.jugadas_restantes == None else self.jugadas_restantes(
+            estado
+        )
+        disponible = max(0, self.restante - self.margen)
+        self.objetivo = disponible / max(n, 1) + 0.8 * self.incremento
+        self.objetivo = min(self.objetivo, disponible)
+        self.maximo = min(4 * self.objetivo, disponible / 2 + self.incremento)
+        self.maximo = max(min(self.maximo, disponible), self.objetivo)
+        self.mejor, self.v, self.repeticiones = None, None, 0
+        self.t_acumulado, self.t_anterior, self.factor_rama = 0, None, 2.0
+        return len(list(juego.jugadas_legales(estado, jugador))) == 1
+
+    def transcurrido(self):
+        return time() - self.t0
+
+    def duro(self):
+        """
+        Segundos que quedan hasta el máximo de esta jugada (para
+        interrumpir una iteración a la mitad)
+
+        """
+        return max(0, self.maximo - self.transcurrido())
+
+    def continua(self, d, mejor, v):
+        """
+        Se llama al terminar cada iteración con la profundidad, la
+        mejor jugada y su valor. Regresa True si conviene otra iteración
+
+        """
+        t = self.transcurrido()
+        t_ultima = t - self.t_acumulado
+        if self.t_anterior:
+            # Crecimiento observado del tiempo entre iteraciones
+            self.factor_rama = min(max(t_ultima / self.t_anterior, 1.5), 10)
+        self.t_acumulado, self.t_anterior = t, t_ultima
+
+        if abs(v) >= 1:
+            return False
+        factor = 1.0
+        if mejor == self.mejor:
+            self.repeticiones += 1
+            if self.repeticiones >= self.estable:
+                factor = 0.5
+        else:
+            if self.mejor != None:
+                factor = 1.5
+            self.repeticiones = 0
+        if self.v != None and v < self.v - self.caida:
+            factor = 2.0
+        self.mejor, self.v = mejor, v
+
+        objetivo = min(self.objetivo * factor, self.maximo)
+        prevision = t + t_ultima * self.factor_rama
+        # Si queda mucho del objetivo se arriesga la siguiente iteración
+        # aunque pueda terminar después, mientras quepa en el máximo
+        return prevision <= objetivo or (
+            t < objetivo / 2 and prevision <= self.maximo
+        )
+
+    def termina(self):
+        """
+        Descuenta el tiempo usado en la jugada y suma el incremento
+
+        """
+        self.restante += self.incremento - self.transcurrido()
+        self.t0 = None
@@ -0,0 +1,384 @@
+"""
+Servicio local de jugadas con asyncio
+
+Recibe peticiones en JSON, una por línea, por TCP en localhost o por
+un socket Unix, y responde una línea JSON por petición (en el orden en
+que terminan, por eso se regresa el mismo id).
+
+Petición:
+
+    {"id": 7, "sesion": "partida-1", "juego": "conecta4",
+     "estado": [...], "jugador": 1, "tiempo": 0.5}
+
+    En lugar de "estado" se pueden mandar las "jugadas" desde el
+    estado inicial ("4453"). Opcionales: "nodos" y "d" (límites de la
+    búsqueda), "plazo" (segundos para responder, contando la espera) y
+    "reloj" (segundos que le quedan al jugador en la partida, con su
+    "incremento"); con reloj el tiempo de la jugada lo decide reloj.Reloj.
+
+Respuesta:
+
+    {"id": 7, "jugada": 3, "pv": [3, 4, 3], "valor": 0.01, "d": 6,
+     "nodos": 12000, "tiempo": 0.49}
+
+    o bien {"id": 7, "error": "..."}
+
+Cada sesión conserva entre peticiones su tabla de transposición (en
+memoria compartida, para que la usen los procesos de búsqueda) y su
+tabla de historia; una petición sin "sesion" usa tablas nuevas que se
+descartan al responder. Las búsquedas corren en un grupo de procesos.
+Cuando hay demasiadas peticiones en espera se rechazan las nuevas (una
+petición con plazo vencido cuenta hasta que su búsqueda termina en el
+proceso), y cada conexión deja de leer mientras tiene muchas peticiones
+en curso. Si el grupo de procesos se rompe se vuelve a crear.
+
+    python servicio.py --puerto 8765
+    python servicio.py --unix /tmp/juegos.sock
+
+"""
+import json
+import asyncio
+import argparse
+from time import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from catalogo import JUEGOS, juego, posicion
+from minimax import busqueda_iterativa
+from transposicion import TablaTransposicion
+from reloj import Reloj
+
+
+def _busca(
+    nombre, estado, jugador, tiempo, nodos, d_max, tabla, mb, historia,
+    reloj=None
+    ):
+    """
+    Búsqueda que corre en un proceso del grupo
+
+    La tabla de la sesión se recibe por nombre y se conecta aquí: si ya
+    no existe (la sesión se liberó mientras la búsqueda esperaba) se
+    regresa un error en lugar de tumbar al proceso
+
+    """
+    try:
+        transp = TablaTransposicion(mb, nombre=tabla)
+    except (OSError, ValueError) as e:
+        return {'error': f"tabla de la sesión no disponible: {e!r}"}, historia
+    info = JUEGOS[nombre]
+    t0 = time()
+    try:
+        traza, v, d, n = busqueda_iterativa(
+            info['modelo'](), estado, jugador, tiempo=tiempo, nodos=nodos,
+            d_max=d_max, ordena=info['ordena'], evalua=info['evalua'],
+            transp=transp, historia=historia, reloj=reloj
+        )
+    finally:
+        transp.cierra()
+    return {
+        'jugada': traza[0], 'pv': traza, 'valor': v, 'd': d,
+        'nodos': n, 'tiempo': time() - t0,
+    }, historia
+
+
+def _en_el_ciclo(loop, funcion, *args):
+    """
+    Llama a funcion en el hilo del ciclo de eventos (las funciones de
+    terminado de un futuro corren en otro hilo). Si el ciclo ya cerró,
+    la llama directamente
+
+    """
+    try:
+        loop.call_soon_threadsafe(funcion, *args)
+    except RuntimeError:
+        funcion(*args)
+
+
+class Sesion:
+    """
+    Estado que se conserva entre peticiones de una misma partida
+
+    """
+    def __init__(self, nombre, mb):
+        self.juego = nombre
+        self.mb = mb
+        self.transp = TablaTransposicion(mb, compartida=True)
+        self.historia = {}
+        self.candado = asyncio.Lock()
+        self.usuarios = 0
+        self.liberada = False
+
+    def libera(self):
+        if not self.liberada:
+            self.liberada = True
+            self.transp.libera()
+
+
+class ServicioJugadas:
+    """
+    Servicio de jugadas
+
+    Parametros
+    ----------
+    procesos (int): Procesos de búsqueda (None, uno por CPU)
+    max_sesiones (int): Sesiones que se conservan; al pasarse se
+        descarta la usada hace más tiempo
+    mb (float): Memoria de la tabla de transposición de cada sesión
+    max_espera (int): Peticiones en espera o en curso antes de rechazar
+    por_conexion (int): Peticiones en curso por conexión antes de
+        dejar de leer de ella
+    tiempo (float): Tiempo de búsqueda si la petición no lo indica
+
+    """
+    def __init__(
+        self, procesos=None, max_sesiones=64, mb=8,
+        max_espera=256, por_conexion=16, tiempo=1.0
+        ):
+        self.procesos = procesos
+        self.max_sesiones = max_sesiones
+        self.mb = mb
+        self.max_espera = max_espera
+        self.por_conexion = por_conexion
+        self.tiempo = tiempo
+        self.sesiones = OrderedDict()
+        # Sesiones fuera de self.sesiones (sin nombre o descartadas) que
+        # todavía tienen búsquedas en curso
+        self.sueltas = set()
+        self.pendientes = 0
+        self.grupo = None
+
+    def inicia(self):
+        self.grupo = ProcessPoolExecutor(self.procesos)
+
+    def termina(self):
+        if self.grupo is not None:
+            self.grupo.shutdown(cancel_futures=True)
+        for sesion in [*self.sesiones.values(), *self.sueltas]:
+            sesion.libera()
+        self.sesiones.clear()
+        self.sueltas.clear()
+
+    def _suelta(self, sesion, nombre_sesion):
+        """
+        Una búsqueda dejó de usar la sesión. Si la sesión ya no está en
+        self.sesiones (no tenía nombre o se descartó) y nadie más la usa,
+        se libera su tabla
+
+        """
+        sesion.usuarios -= 1
+        if (sesion.usuarios == 0
+                and self.sesiones.get(nombre_sesion) is not sesion):
+            self.sueltas.discard(sesion)
+            sesion.libera()
+
+    def _termina_busqueda(self, sesion, nombre_sesion):
+        # La petición cuenta como pendiente hasta que termina su búsqueda
+        # en el proceso, aunque ya se haya respondido por plazo vencido
+        self.pendientes -= 1
+        self._suelta(sesion, nombre_sesion)
+
+    def _envia(self, *args):
+        """
+        Manda una búsqueda al grupo de procesos, que se vuelve a crear
+        si se rompió (por ejemplo, si murió uno de sus procesos)
+
+        """
+        try:
+            return self.grupo.submit(_busca, *args)
+        except BrokenProcessPool:
+            self.grupo.shutdown(wait=False, cancel_futures=True)
+            self.grupo = ProcessPoolExecutor(self.procesos)
+            return self.grupo.submit(_busca, *args)
+
+    def sesion(self, nombre_sesion, nombre_juego):
+        """
+        Devuelve la sesión, creándola si no existe
+
+        """
+        if nombre_sesion in self.sesiones:
+            sesion = self.sesiones[nombre_sesion]
+            if sesion.juego != nombre_juego:
+                raise ValueError(
+                    f"La sesión {nombre_sesion!r} es de {sesion.juego}"
+                )
+            self.sesiones.move_to_end(nombre_sesion)
+            return sesion
+        while len(self.sesiones) >= self.max_sesiones:
+            _, vieja = self.sesiones.popitem(last=False)
+            if vieja.usuarios == 0:
+                vieja.libera()
+            else:
+                self.sueltas.add(vieja)
+        sesion = Sesion(nombre_juego, self.mb)
+        self.sesiones[nombre_sesion] = sesion
+        return sesion
+
+    async def atiende(self, peticion):
+        """
+        Resuelve una petición y devuelve la respuesta (dict)
+
+        """
+        loop = asyncio.get_running_loop()
+        inicio = loop.time()
+        respuesta = {'id': peticion.get('id')}
+        if self.pendientes >= self.max_espera:
+            respuesta['error'] = "servicio saturado"
+            return respuesta
+        self.pendientes += 1
+        enviada = False
+        try:
+            nombre = peticion['juego']
+            info = juego(nombre)
+            if 'estado' in peticion:
+                estado = info['lee_estado'](peticion['estado'])
+                jugador = peticion['jugador']
+            else:
+                _, estado, jugador = posicion(
+                    nombre, peticion.get('jugadas', '')
+                )
+                jugador = peticion.get('jugador', jugador)
+            if jugador not in (1, -1):
+                raise ValueError("jugador debe ser 1 o -1")
+            modelo = info['modelo']()
+            if modelo.terminal(estado):
+                raise ValueError("El estado es terminal")
+            reloj = None
+            if 'reloj' in peticion:
+                reloj = Reloj(
+                    peticion['reloj'], peticion.get('incremento', 0),
+                    jugadas_restantes=info['jugadas_restantes']
+                )
+            tiempo = peticion.get(
+                'tiempo', self.tiempo if reloj is None else None
+            )
+            plazo = inicio + peticion.get(
+                'plazo', 2 * (tiempo or peticion['reloj'] / 2) + 1
+            )
+            nombre_sesion = peticion.get('sesion')
+            if nombre_sesion == None:
+                # Sin sesión, tablas propias que se descartan al terminar
+                sesion = Sesion(nombre, self.mb)
+                self.sueltas.add(sesion)
+            else:
+                sesion = self.sesion(nombre_sesion, nombre)
+            sesion.usuarios += 1
+            try:
+                async with sesion.candado:
+                    restante = plazo - loop.time()
+                    if restante <= 0:
+                        raise asyncio.TimeoutError()
+                    # El margen es para arrancar y regresar del proceso
+                    futuro = self._envia(
+                        nombre, estado, jugador,
+                        min(tiempo or restante, 0.9 * restante),
+                        peticion.get('nodos'), peticion.get('d'),
+                        sesion.transp.nombre, sesion.mb, sesion.historia,
+                        reloj
+                    )
+                    enviada = True
+                    # La tabla se suelta hasta que la búsqueda termina de
+                    # verdad: cancelar la espera no la quita del proceso
+                    futuro.add_done_callback(
+                        lambda _: _en_el_ciclo(
+                            loop, self._termina_busqueda, sesion,
+                            nombre_sesion
+                        )
+                    )
+                    resultado, historia = await asyncio.wait_for(
+                        asyncio.wrap_future(futuro), restante
+                    )
+                    if 'error' not in resultado:
+                        sesion.historia = historia
+            finally:
+                if not enviada:
+                    self._suelta(sesion, nombre_sesion)
+            respuesta.update(resultado)
+        except asyncio.TimeoutError:
+            respuesta['error'] = "plazo vencido"
+        except (KeyError, TypeError, ValueError) as e:
+            respuesta['error'] = f"petición inválida: {e}"
+        except Exception as e:
+            respuesta['error'] = f"error interno: {e!r}"
+        finally:
+            if not enviada:
+                self.pendientes -= 1
+        return respuesta
+
+    async def conexion(self, lector, escritor):
+        """
+        Atiende una conexión: cada línea es una petición
+
+        """
+        en_curso = asyncio.Semaphore(self.por_conexion)
+        tareas = set()
+
+        async def responde(peticion):
+            try:
+                respuesta = await self.atiende(peticion)
+                escritor.write((json.dumps(respuesta) + '\n').encode())
+                await escritor.drain()
+            finally:
+                en_curso.release()
+
+        try:
+            while linea := await lector.readline():
+                if not linea.strip():
+                    continue
+                try:
+                    peticion = json.loads(linea)
+                except json.JSONDecodeError as e:
+                    escritor.write((json.dumps(
+                        {'id': None, 'error': f"JSON inválido: {e}"}
+                    ) + '\n').encode())
+                    continue
+                await en_curso.acquire()
+                tarea = asyncio.create_task(responde(peticion))
+                tareas.add(tarea)
+                tarea.add_done_callback(tareas.discard)
+            if tareas:
+                await asyncio.gather(*tareas, return_exceptions=True)
+        finally:
+            escritor.close()
+
+    async def sirve(self, anfitrion='127.0.0.1', puerto=8765, unix=None):
+        """
+        Arranca el servicio y atiende hasta que se cancele
+
+        """
+        self.inicia()
+        try:
+            if unix is not None:
+                servidor = await asyncio.start_unix_server(
+                    self.conexion, path=unix
+                )
+            else:
+                servidor = await asyncio.start_server(
+                    self.conexion, anfitrion, puerto
+                )
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            self.termina()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--anfitrion', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--unix', help="Ruta de un socket Unix")
+    parser.add_argument('--procesos', type=int)
+    parser.add_argument('--sesiones', type=int, default=64)
+    parser.add_argument('--mb', type=float, default=8,
+                        help="Memoria de la tabla de cada sesión")
+    parser.add_argument('--tiempo', type=float, default=1.0)
+    args = parser.parse_args()
+
+    servicio = ServicioJugadas(
+        procesos=args.procesos, max_sesiones=args.sesiones,
+        mb=args.mb, tiempo=args.tiempo
+    )
+    try:
+        asyncio.run(servicio.sirve(args.anfitrion, args.puerto, args.unix))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,365 @@
+"""
+Tabla de transposición de tamaño fijo sobre un buffer plano
+
+La tabla reserva desde el inicio toda su memoria, de modo que no crece
+sin límite durante búsquedas largas, y el buffer puede vivir en memoria
+compartida (multiprocessing.shared_memory) para que varios procesos
+trabajen sobre la misma tabla.
+
+Cada entrada ocupa tres palabras de 64 bits:
+
+    0: clave ^ valor ^ datos   (verificación XOR)
+    1: valor                   (los bits de un float64)
+    2: datos empaquetados      (ocupada, cota, profundidad y jugada)
+
+Las entradas se agrupan en cubetas de dos: la primera se reemplaza
+por profundidad y la segunda siempre (esquema de dos niveles).
+
+No se usan candados. Si dos procesos escriben a la vez la misma
+entrada, o uno lee mientras otro escribe, la verificación XOR no
+coincide con la clave y la entrada simplemente se ignora.
+
+El buffer también puede ser un archivo mapeado a memoria (mmap), para
+que los resultados de búsquedas profundas persistan entre ejecuciones
+y varios procesos lean y escriban el mismo archivo a la vez:
+
+    transp = TablaTransposicion(64, archivo='conecta4.tt', firma='v1')
+
+El archivo empieza con un encabezado (marca, versión, número de
+cubetas y firma). Si la firma no coincide (por ejemplo, porque cambió
+la función de evaluación) el archivo se reemplaza por uno vacío; los
+procesos que ya lo tenían abierto siguen con la tabla anterior. El
+tamaño se fija al crear el archivo y el reemplazo de la tabla hace las
+veces de política de desalojo. Como hash(None) cambia entre
+ejecuciones, con archivo la clave por omisión es clave_estable.
+
+"""
+import os
+import mmap
+import tempfile
+from struct import Struct
+from hashlib import blake2b
+from multiprocessing import shared_memory
+
+try:
+    from fcntl import flock, LOCK_EX, LOCK_UN
+except ImportError:  # Windows
+    flock = None
+
+EXACTA, INFERIOR, SUPERIOR = 0, 1, 2
+PROF_MAX = 0xFFFF  # Profundidad de una búsqueda hasta el final
+SIN_JUGADA = 0xFFFF
+
+_MASCARA = (1 << 64) - 1
+_PALABRAS = 3
+_POR_CUBETA = 2
+_BYTES_CUBETA = 8 * _PALABRAS * _POR_CUBETA
+
+_flotante = Struct('<d')
+_entero = Struct('<Q')
+
+_MARCA = int.from_bytes(b'JUEGOTT1', 'little')
+_VERSION = 1
+_ENCABEZADO = Struct('<QQQQ')
+_BYTES_ENCABEZADO = 64
+
+
+def _a_bits(v):
+    return _entero.unpack(_flotante.pack(v))[0]
+
+
+def _de_bits(b):
+    return _flotante.unpack(_entero.pack(b))[0]
+
+
+def _empaqueta(d, cota, jugada):
+    return 1 | (cota << 1) | (d << 3) | (jugada << 19)
+
+
+def _desempaqueta(datos):
+    return (datos >> 3) & 0xFFFF, (datos >> 1) & 3, (datos >> 19) & 0xFFFF
+
+
+def clave_estable(estado):
+    """
+    Clave de 64 bits que no cambia entre ejecuciones (a diferencia de
+    hash con None o cadenas), a partir de repr(estado)
+
+    """
+    resumen = blake2b(repr(estado).encode(), digest_size=8).digest()
+    return int.from_bytes(resumen, 'little')
+
+
+def _firma(texto):
+    return int.from_bytes(
+        blake2b(str(texto).encode(), digest_size=8).digest(), 'little'
+    )
+
+
+class TablaTransposicion:
+    """
+    Tabla de transposición con presupuesto fijo de memoria
+
+    Parametros
+    ----------
+    mb (float): Memoria máxima en megabytes. El número de cubetas
+        se redondea a la potencia de dos inferior
+    compartida (bool): Si True, el buffer se crea en memoria compartida
+        y la tabla se puede pasar (pickle) a otros procesos
+    nombre (str): Nombre de un bloque de memoria compartida ya existente
+        al que se quiere conectar la tabla
+    clave (function): Función que convierte un estado en un entero.
+        Debe dar el mismo valor en todos los procesos que comparten
+        la tabla (hash lo cumple para tuplas de enteros). Si None, hash
+        o, con archivo, clave_estable
+    archivo (str): Ruta de un archivo donde persiste la tabla. Si ya
+        existe con la misma firma se usa su tamaño y su contenido
+    firma (str): Identifica lo que se guarda en el archivo (juego,
+        evaluación, pesos). Un archivo con otra firma se reinicia
+
+    """
+    def __init__(
+        self, mb=16, compartida=False, nombre=None, clave=None,
+        archivo=None, firma=''
+        ):
+        cubetas = max(1, int(mb * 2 ** 20) // _BYTES_CUBETA)
+        self.n_cubetas = 1 << (cubetas.bit_length() - 1)
+        if clave is None:
+            clave = hash if archivo is None else clave_estable
+        self.clave = clave
+        self._shm = None
+        self._mmap = None
+        self.archivo = archivo
+        self.firma = firma
+        tam = self.n_cubetas * _BYTES_CUBETA
+        if archivo is not None:
+            self._abre(archivo)
+        elif nombre is not None:
+            self._shm = _conecta(nombre)
+            if self._shm.size < tam:
+                raise ValueError("El bloque compartido es menor que la tabla")
+            self._palabras = self._shm.buf[:tam].cast('Q')
+        elif compartida:
+            self._shm = shared_memory.SharedMemory(create=True, size=tam)
+            self._palabras = self._shm.buf[:tam].cast('Q')
+            self.limpia()
+        else:
+            self._palabras = memoryview(bytearray(tam)).cast('Q')
+
+    def _abre(self, archivo):
+        """
+        Mapea el archivo a memoria, creándolo o reemplazándolo si su
+        encabezado no corresponde a esta tabla
+
+        """
+        firma = _firma(self.firma)
+        while True:
+            fd = os.open(archivo, os.O_RDWR | os.O_CREAT, 0o644)
+            nuevo = None
+            try:
+                if flock is not None:
+                    flock(fd, LOCK_EX)
+                # Otro proceso pudo reemplazar el archivo mientras se
+                # esperaba el candado: se vuelve a abrir
+                actual, abierto = os.stat(archivo), os.fstat(fd)
+                if (actual.st_ino, actual.st_dev) != (
+                    abierto.st_ino, abierto.st_dev
+                ):
+                    continue
+                encabezado = os.pread(fd, _ENCABEZADO.size, 0)
+                valido = False
+                if len(encabezado) == _ENCABEZADO.size:
+                    marca, version, n_cubetas, f = _ENCABEZADO.unpack(
+                        encabezado
+                    )
+                    tam = _BYTES_ENCABEZADO + n_cubetas * _BYTES_CUBETA
+                    valido = (
+                        marca == _MARCA and version == _VERSION
+                        and f == firma and n_cubetas > 0
+                        and n_cubetas & (n_cubetas - 1) == 0
+                        and abierto.st_size >= tam
+                    )
+                if valido:
+                    self.n_cubetas = n_cubetas
+                else:
+                    nuevo = _reemplaza(archivo, self.n_cubetas, firma)
+                tam = self.n_cubetas * _BYTES_CUBETA
+                self._mmap = mmap.mmap(
+                    fd if nuevo is None else nuevo, _BYTES_ENCABEZADO + tam
+                )
+                break
+            finally:
+                if nuevo is not None:
+                    os.close(nuevo)
+                if flock is not None:
+                    flock(fd, LOCK_UN)
+                os.close(fd)
+        self._palabras = memoryview(self._mmap)[
+            _BYTES_ENCABEZADO:_BYTES_ENCABEZADO + tam
+        ].cast('Q')
+
+    @property
+    def nombre(self):
+        """Nombre del bloque de memoria compartida (o None)"""
+        return None if self._shm is None else self._shm.name
+
+    def busca(self, estado):
+        """
+        Busca el estado en la tabla
+
+        Regresa
+        -------
+        None si no está, o bien (valor, d, cota, jugada) donde d es
+        PROF_MAX si el valor viene de una búsqueda hasta el final, y
+        jugada es el índice de la mejor jugada en la lista de jugadas
+        legales del estado (o None)
+
+        """
+        k = self.clave(estado) & _MASCARA
+        p = self._palabras
+        i = (k & (self.n_cubetas - 1)) * _PALABRAS * _POR_CUBETA
+        for i in (i, i + _PALABRAS):
+            w0, w1, w2 = p[i], p[i + 1], p[i + 2]
+            if w2 & 1 and w0 ^ w1 ^ w2 == k:
+                d, cota, jugada = _desempaqueta(w2)
+                return (
+                    _de_bits(w1), d, cota,
+                    None if jugada == SIN_JUGADA else jugada
+                )
+        return None
+
+    def guarda(self, estado, valor, d, cota=EXACTA, jugada=None):
+        """
+        Guarda el resultado de buscar el estado
+
+        Parametros
+        ----------
+        estado: Estado del juego
+        valor (float): Valor encontrado
+        d (int): Profundidad de la búsqueda, None si fue hasta el final
+        cota (EXACTA, INFERIOR, SUPERIOR): Tipo de valor
+        jugada (int): Índice de la mejor jugada en jugadas_legales
+
+        """
+        k = self.clave(estado) & _MASCARA
+        d = PROF_MAX if d is None else min(d, PROF_MAX - 1)
+        jugada = SIN_JUGADA if jugada is None else min(jugada, SIN_JUGADA)
+        w1 = _a_bits(valor)
+        w2 = _empaqueta(d, cota, jugada)
+        p = self._palabras
+        i = (k & (self.n_cubetas - 1)) * _PALABRAS * _POR_CUBETA
+
+        # Primer nivel: se queda la búsqueda más profunda
+        v0, v1, v2 = p[i], p[i + 1], p[i + 2]
+        ocupada = v2 & 1
+        misma = ocupada and v0 ^ v1 ^ v2 == k
+        if not ocupada or misma or d >= _desempaqueta(v2)[0]:
+            if ocupada and not misma:
+                # La entrada desplazada baja al segundo nivel
+                p[i + 3], p[i + 4], p[i + 5] = v0, v1, v2
+            p[i], p[i + 1], p[i + 2] = k ^ w1 ^ w2, w1, w2
+        else:
+            # Segundo nivel: siempre se reemplaza
+            p[i + 3], p[i + 4], p[i + 5] = k ^ w1 ^ w2, w1, w2
+
+    def limpia(self):
+        """Borra todas las entradas"""
+        octetos = self._palabras.cast('B')
+        octetos[:] = bytes(len(octetos))
+        octetos.release()
+
+    def sincroniza(self):
+        """Escribe al disco los cambios de una tabla con archivo"""
+        if self._mmap is not None:
+            self._mmap.flush()
+
+    def cierra(self):
+        """
+        Suelta el buffer (y la conexión a la memoria compartida, o el
+        archivo, que se escribe al disco)
+
+        """
+        self._palabras.release()
+        if self._shm is not None:
+            self._shm.close()
+        if self._mmap is not None:
+            self._mmap.flush()
+            self._mmap.close()
+
+    def libera(self):
+        """
+        Cierra la tabla y destruye el bloque de memoria compartida
+        (el archivo de una tabla persistente se conserva)
+
+        """
+        self.cierra()
+        if self._shm is not None:
+            self._shm.unlink()
+
+    def __del__(self):
+        # Sin esto la memoria compartida no se puede cerrar al destruirse
+        if hasattr(self, '_palabras'):
+            self._palabras.release()
+
+    def __getstate__(self):
+        estado = {'n_cubetas': self.n_cubetas, 'clave': self.clave}
+        if self._mmap is not None:
+            estado['archivo'] = self.archivo
+            estado['firma'] = self.firma
+        elif self._shm is not None:
+            estado['nombre'] = self._shm.name
+        else:
+            estado['datos'] = self._palabras.tobytes()
+        return estado
+
+    def __setstate__(self, estado):
+        self.n_cubetas = estado['n_cubetas']
+        self.clave = estado['clave']
+        tam = self.n_cubetas * _BYTES_CUBETA
+        self._shm = self._mmap = self.archivo = None
+        self.firma = estado.get('firma', '')
+        if 'archivo' in estado:
+            self.archivo = estado['archivo']
+            self._abre(self.archivo)
+        elif 'nombre' in estado:
+            self._shm = _conecta(estado['nombre'])
+            self._palabras = self._shm.buf[:tam].cast('Q')
+        else:
+            self._palabras = memoryview(bytearray(estado['datos'])).cast('Q')
+
+
+def _reemplaza(archivo, n_cubetas, firma):
+    """
+    Crea una tabla vacía en un archivo temporal y la pone en lugar de
+    `archivo`. Los procesos que ya tienen mapeado el archivo anterior
+    siguen usando su copia (el reemplazo no lo trunca)
+
+    Regresa
+    -------
+    int: Descriptor del archivo nuevo
+
+    """
+    directorio = os.path.dirname(os.path.abspath(archivo))
+    fd, temporal = tempfile.mkstemp(dir=directorio, prefix='.tt-')
+    try:
+        os.fchmod(fd, 0o644)
+        os.ftruncate(fd, _BYTES_ENCABEZADO + n_cubetas * _BYTES_CUBETA)
+        os.pwrite(fd, _ENCABEZADO.pack(_MARCA, _VERSION, n_cubetas, firma), 0)
+        os.replace(temporal, archivo)
+    except BaseException:
+        os.close(fd)
+        os.unlink(temporal)
+        raise
+    return fd
+
+
+def _conecta(nombre):
+    """
+    Se conecta a un bloque de memoria compartida existente sin
+    registrarlo para su destrucción (si la versión de Python lo permite)
+
+    """
+    try:
+        return shared_memory.SharedMemory(name=nombre, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=nombre)
@@ -1,19 +1,24 @@
 import sys
+import json
+from functools import partial
 from random import shuffle
 from juegos_simplificado import ModeloJuegoZT2, alpha_beta, juega_dos_jugadores
+from pesos import carga_pesos
+from numeros_prueba import resuelve
+from transposicion import TablaTransposicion, EXACTA
 
 class UltimateTicTacToe(ModeloJuegoZT2):
     """
     Ultimate Tic-Tac-Toe: 9 tableros pequeños de 3x3 en una cuadrícula de 3x3.
     Jugadores: 1 (X) y -1 (O).
-    Representación del estado: 
-      - boards: lista de 9 listas de 9 celdas (0 vacío, 1 X, -1 O)
-      - macro: lista de 9 estados (0 en curso, 1 X ganó, -1 O ganó, 2 empate)
+    Representación del estado (todo en tuplas para poder usarlo como llave): 
+      - boards: tupla de 9 tuplas de 9 celdas (0 vacío, 1 X, -1 O)
+      - macro: tupla de 9 estados (0 en curso, 1 X ganó, -1 O ganó, 2 empate)
       - next_board: índice [0..8] del tablero pequeño a jugar, o None para cualquiera
     """
     def inicializa(self):
-        boards = [[0]*9 for _ in range(9)]
-        macro = [0]*9
+        boards = tuple((0,)*9 for _ in range(9))
+        macro = (0,)*9
         next_board = None
         state = (boards, macro, next_board)
         return state, 1  # X comienza
@@ -44,7 +49,7 @@ class UltimateTicTacToe(ModeloJuegoZT2):
         next_board = i
         if new_macro[next_board]!=0:
             next_board = None
-        return (new_boards, new_macro, next_board)
+        return (tuple(map(tuple, new_boards)), tuple(new_macro), next_board)
 
     def terminal(self, s):
         _, macro, _ = s
@@ -54,6 +59,16 @@ class UltimateTicTacToe(ModeloJuegoZT2):
         # empate si todos los tableros pequeños están decididos
         return all(m in (1, -1, 2) for m in macro)
 
+    def resultado(self, s):
+        # terminal y ganancia con una sola revisión del tablero macro
+        _, macro, _ = s
+        w = self._check_winner(macro)
+        if w in (1, -1):
+            return w
+        if all(m in (1, -1, 2) for m in macro):
+            return 0
+        return None
+
     def ganancia(self, s):
         _, macro, _ = s
         w = self._check_winner(macro)
@@ -75,6 +90,15 @@ class UltimateTicTacToe(ModeloJuegoZT2):
                 return cells[i]
         return 0
 
+# Pesos de la heurística (ver pesos.py y ajusta_pesos.py)
+PESOS_UTTT = carga_pesos('uttt', {
+    'macro': 100,       # tablero pequeño ganado
+    'potencial': 10,    # potencial de los tableros pequeños en curso
+    'estrategica': 50,  # tablero ganado en esquina o centro
+    'dos': 3,           # dos en línea con posibilidad de ganar
+    'uno': 1,           # uno en línea con espacios abiertos
+})
+
 # Evaluación heurística
 def heuristic(s, j):
     boards, macro, next_board = s
@@ -82,23 +106,23 @@ def heuristic(s, j):
     # peso del control macro
     for m in macro:
         if m==j:
-            score += 100
+            score += PESOS_UTTT['macro']
         elif m==-j:
-            score -= 100
+            score -= PESOS_UTTT['macro']
     
     # potencial de tableros pequeños
     for idx, b in enumerate(boards):
         if macro[idx]==0:
-            score += _small_board_potential(b, j) * 10
-            score -= _small_board_potential(b, -j) * 10
+            score += _small_board_potential(b, j) * PESOS_UTTT['potencial']
+            score -= _small_board_potential(b, -j) * PESOS_UTTT['potencial']
     
     # posiciones estratégicas
     strategic_indices = [0, 2, 4, 6, 8]
     for idx in strategic_indices:
         if macro[idx]==j:
-            score += 50
+            score += PESOS_UTTT['estrategica']
         elif macro[idx]==-j:
-            score -= 50
+            score -= PESOS_UTTT['estrategica']
     
     return score
 
@@ -113,11 +137,42 @@ def _small_board_potential(cells, player):
     for (i,j,k) in lines:
         line = [cells[i], cells[j], cells[k]]
         if line.count(player)==2 and line.count(0)==1:
-            pot += 3  # dos en línea con posibilidad de ganar
+            pot += PESOS_UTTT['dos']  # dos en línea con posibilidad de ganar
         elif line.count(player)==1 and line.count(0)==2:
-            pot += 1  # uno en línea con espacios abiertos
+            pot += PESOS_UTTT['uno']  # uno en línea con espacios abiertos
     return pot
 
+# Escala de evalua_uttt: la heurística debe quedar por debajo de ella
+ESCALA_UTTT = 10000
+
+def evalua_uttt(s):
+    """
+    Heurística escalada para negamax: siempre para el jugador 1 y
+    dentro de (-1, 1), para que no supere a la ganancia de un estado
+    terminal
+    """
+    return heuristic(s, 1) / ESCALA_UTTT
+
+def jugadas_restantes_uttt(s):
+    """
+    Estima las jugadas que le faltan a un jugador (para el reloj).
+    Las partidas suelen decidirse mucho antes de llenar el tablero,
+    por eso se supone que se juega un tercio de las casillas libres,
+    la mitad por cada jugador
+    """
+    boards, macro, _ = s
+    libres = sum(b.count(0) for b, m in zip(boards, macro) if m == 0)
+    return max(libres // 6, 2)
+
+def ordena_uttt(jugadas, jugador):
+    """
+    Ordena las jugadas para negamax: primero el centro de cada tablero
+    pequeño, luego las esquinas y al final las orillas
+    """
+    return sorted(jugadas, key=lambda a: _PRIORIDAD_CELDA[a[1]])
+
+_PRIORIDAD_CELDA = (1, 2, 1, 2, 0, 2, 1, 2, 1)
+
 # Función de visualización mejorada simple
 def print_board(s):
     boards, macro, next_board = s
@@ -194,7 +249,18 @@ def human_player(juego, s, j):
         except:
             print("Formato inválido. Usa 'tablero,celda' (ej. '4,8').")
 
-def ai_player(juego, s, j):
+# Nodos expandidos de la búsqueda por números de prueba cuando se activa
+# (--prueba). Cada nodo genera todas sus jugadas, así que es lento
+NODOS_PRUEBA = 5000
+
+def ai_player(juego, s, j, nodos_prueba=0, cache=None):
+    """
+    Jugador de la IA: alpha-beta a profundidad MAX_DEPTH. Con
+    nodos_prueba (por ejemplo NODOS_PRUEBA) antes se busca una línea
+    forzada con números de prueba. Con cache (una TablaTransposicion, por
+    ejemplo la de cache_ai) se reutiliza la jugada de una posición ya
+    analizada, también entre ejecuciones si la tabla tiene archivo
+    """
     # Profundidad máxima para la búsqueda alpha-beta
     MAX_DEPTH = 3
     
@@ -206,7 +272,7 @@ def ai_player(juego, s, j):
         j = jugador
         
         def max_val(estado, jugador, alpha, beta, depth):
-            if juego.terminal(estado) or depth == 0:
+            if depth == 0 or juego.resultado(estado) is not None:
                 return evaluate_move(estado, j)
             v = -float('inf')
             jugadas = list(juego.jugadas_legales(estado, jugador))
@@ -225,7 +291,7 @@ def ai_player(juego, s, j):
             return v
         
         def min_val(estado, jugador, alpha, beta, depth):
-            if juego.terminal(estado) or depth == 0:
+            if depth == 0 or juego.resultado(estado) is not None:
                 return evaluate_move(estado, j)
             v = float('inf')
             jugadas = list(juego.jugadas_legales(estado, jugador))
@@ -265,13 +331,42 @@ def ai_player(juego, s, j):
                 best_move = a
             alpha = max(alpha, best_score)
         
-        return best_move
+        return best_move, best_score
     
     print(f"\nLa IA ({('X' if j==1 else 'O')}) está pensando...")
-    move = alpha_beta_limited(juego, s, j)
+    jugadas = list(juego.jugadas_legales(s, j))
+    entrada = None if cache == None else cache.busca(s)
+    # Una colisión de claves puede dar un índice que no es de estas jugadas
+    if (entrada != None and entrada[1] >= MAX_DEPTH and entrada[3] != None
+            and entrada[3] < len(jugadas)):
+        move = jugadas[entrada[3]]
+        print(f"La IA eligió el movimiento: {move}")
+        return move
+    # Antes de la búsqueda heurística se busca una línea forzada
+    # con números de prueba (gana, o al menos empata, a cualquier profundidad)
+    valor, move = None, None
+    if nodos_prueba:
+        valor, move, _ = resuelve(
+            juego, s, j, ordena=ordena_uttt, nodos=nodos_prueba
+        )
+    if valor == None or valor < 0 or move == None:
+        move, score = alpha_beta_limited(juego, s, j)
+        if cache != None:
+            cache.guarda(s, score, MAX_DEPTH, EXACTA, jugadas.index(move))
+    elif cache != None:
+        # Una jugada demostrada vale a cualquier profundidad
+        cache.guarda(s, float(valor), None, EXACTA, jugadas.index(move))
     print(f"La IA eligió el movimiento: {move}")
     return move
 
+def cache_ai(archivo, mb=16):
+    """
+    Tabla en archivo para las jugadas de ai_player. La firma incluye
+    los pesos de la heurística, así que si cambian el archivo se reinicia
+    """
+    firma = 'uttt|ai_player|' + json.dumps(PESOS_UTTT, sort_keys=True)
+    return TablaTransposicion(mb, archivo=archivo, firma=firma)
+
 def main():
     juego = UltimateTicTacToe()
     
@@ -283,9 +378,18 @@ def main():
     print("  hva - Humano vs IA (predeterminado)")
     print("  aah - IA vs Humano")
     print("  ava - IA vs IA")
+    print("Un segundo argumento opcional es el archivo donde la IA guarda")
+    print("sus análisis entre partidas (ej. uttt.tt), y con --prueba la IA")
+    print("busca líneas forzadas antes de cada jugada (más lento)")
     
     # Procesar argumento de línea de comandos
-    mode = sys.argv[1] if len(sys.argv) > 1 else None
+    prueba = '--prueba' in sys.argv
+    args = [a for a in sys.argv[1:] if a != '--prueba']
+    mode = args[0] if len(args) > 0 else None
+    cache = cache_ai(args[1]) if len(args) > 1 else None
+    ia = partial(
+        ai_player, cache=cache, nodos_prueba=NODOS_PRUEBA if prueba else 0
+    )
     
     # Si no se proporciona modo, preguntar al usuario
     if mode not in ['hva', 'aah', 'ava']:
@@ -307,17 +411,19 @@ def main():
     
     # Establecer jugadores según el modo
     if mode == 'hva':
-        p1, p2 = human_player, ai_player
+        p1, p2 = human_player, ia
         print("\nJuegas como X (primero)")
     elif mode == 'aah':
-        p1, p2 = ai_player, human_player
+        p1, p2 = ia, human_player
         print("\nJuegas como O (segundo)")
     else:  # ava
-        p1 = p2 = ai_player
+        p1 = p2 = ia
         print("\nDemostración IA vs IA")
     
     # Jugar el juego
     result, final = juega_dos_jugadores(juego, p1, p2)
+    if cache != None:
+        cache.cierra()
     
     # Mostrar estado final
     print("\n==== FIN DEL JUEGO ====")